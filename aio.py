@@ -0,0 +1,93 @@
+#----------------------------------------------------------------------------#
+# Async database access.
+#
+# In ASGI mode (asgi.py) every request runs in a worker thread while the
+# server's event loop owns the sockets. Views stay synchronous, but can hand
+# independent statements to gather(), which runs them concurrently on that
+# loop through an AsyncSession each (asyncpg for PostgreSQL, aiosqlite for
+# SQLite) and waits for all of them. Under plain WSGI, or with ASYNC_QUERIES
+# off, enabled() is False and callers run their statements one by one.
+#----------------------------------------------------------------------------#
+
+import asyncio
+import threading
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy.engine import make_url
+
+# sync driver -> async driver
+DRIVERS = {
+  "postgresql": 'postgresql+asyncpg',
+  "sqlite": 'sqlite+aiosqlite',
+}
+
+# key under which asgi.py puts its event loop into the WSGI environ
+LOOP_KEY = 'fyyur.event_loop'
+
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=DRIVERS[url.get_backend_name()])
+
+
+async def fetch(async_engine, statement):
+    from sqlalchemy.ext.asyncio import AsyncSession
+    # one session per statement: an AsyncSession must not run two at once
+    async with AsyncSession(async_engine) as session:
+        return (await session.execute(statement)).scalars().all()
+
+
+class AsyncDatabase(object):
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_QUERIES', True)
+        app.config.setdefault('ASYNC_DATABASE_URI', None)
+        app.config.setdefault('ASYNC_ENGINE_OPTIONS', {})
+        app.config.setdefault('ASGI_THREADS', 8)
+        # url -> AsyncEngine; the primary's, plus one per replica in use
+        app.extensions['aio'] = {"engines": {}}
+
+    def enabled(self):
+        return (has_request_context() and request.environ.get(LOOP_KEY) is not None
+                and current_app.config['ASYNC_QUERIES'])
+
+    def engine(self, app, url=None):
+        # the async twin of the primary, or of the replica engine at `url`
+        if url is None:
+            url = app.config['ASYNC_DATABASE_URI'] or async_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        else:
+            url = async_url(url)
+        engines = app.extensions['aio']['engines']
+        key = str(url)
+        with self.lock:
+            if key not in engines:
+                try:
+                    from sqlalchemy.ext.asyncio import create_async_engine
+                    engines[key] = create_async_engine(url, **app.config['ASYNC_ENGINE_OPTIONS'])
+                except ImportError as error:
+                    raise RuntimeError('ASYNC_QUERIES needs asyncpg or aiosqlite installed ({})'.format(error))
+            return engines[key]
+
+    def gather(self, *statements):
+        # runs ORM select() statements concurrently on the server's loop and
+        # returns their scalars().all() lists in order; follows the replica
+        # routing of @replicas.read_only
+        replica = g.get('db_replica')
+        async_engine = self.engine(current_app._get_current_object(), replica.url if replica is not None else None)
+
+        async def run():
+            return await asyncio.gather(*[fetch(async_engine, statement) for statement in statements])
+
+        return asyncio.run_coroutine_threadsafe(run(), request.environ[LOOP_KEY]).result()
+
+    async def dispose(self, app):
+        state = app.extensions.get('aio')
+        if state:
+            engines, state['engines'] = state['engines'], {}
+            for async_engine in engines.values():
+                await async_engine.dispose()
@@ -0,0 +1,176 @@
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, current_app
+
+from extensions import cache, replicas
+from cache import conditional
+from forms import ArtistForm
+from models import db, Artist, utcnow
+from tasks import queue_image_check
+from queries import (genres_named, decode_cursor, page_size, artist_page, search_results, artist_cache_tags,
+                     artist_version, table_version, artist_detail)
+
+bp = Blueprint('artists', __name__)
+
+
+@bp.route('/artists')
+@replicas.read_only
+@conditional(lambda: table_version(Artist))
+@cache.cached('artists')
+def artists():
+    # alphabetical artist index, a page at a time
+    letter = request.args.get('letter')
+    if letter is not None and not (len(letter) == 1 and letter.isalpha()):
+        abort(400)
+    try:
+        after = before = None
+        if request.args.get('after'):
+            sort_name, artist_id = decode_cursor(request.args['after'])
+            after = (str(sort_name), int(artist_id))
+        elif request.args.get('before'):
+            sort_name, artist_id = decode_cursor(request.args['before'])
+            before = (str(sort_name), int(artist_id))
+    except (TypeError, ValueError):
+        abort(400)
+
+    limit = page_size(current_app.config['ARTISTS_PAGE_SIZE'], current_app.config['ARTISTS_PAGE_SIZE_MAX'])
+    data, prev_cursor, next_cursor = artist_page(limit, after=after, before=before, letter=letter)
+
+    return render_template('pages/artists.html', artists=data, letter=letter,
+                           prev_cursor=prev_cursor, next_cursor=next_cursor,
+                           limit=request.args.get('limit', type=int))
+
+
+@bp.route('/artists/search', methods=['POST'])
+@replicas.read_only
+def search_artists():
+    # ranked search over artist name, city and genres.
+    # search for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+    search_term = request.form.get('search_term', '')
+    response = search_results(Artist, search_term)
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+@bp.route('/artists/<int:artist_id>')
+@replicas.read_only
+@conditional(artist_version)
+@cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    return render_template('pages/show_artist.html', artist=artist_detail(artist_id))
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    form = ArtistForm()
+    # TODO: populate form with fields from artist with ID <artist_id>
+    my_artist = Artist.query.get_or_404(artist_id)
+
+    artist = {
+      "id": artist_id,
+      "name": my_artist.name,
+      "genres": [genre.name for genre in my_artist.genres],
+      "city": my_artist.city,
+      "state": my_artist.state,
+      "phone": my_artist.phone,
+      "website_link": my_artist.website_link,
+      "facebook_link": my_artist.facebook_link,
+      "seeking_venue": my_artist.seeking_venue,
+      "seeking_description": my_artist.seeking_description,
+      "image_link": my_artist.image_link
+    }
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+
+    seeking_venue = request.form.get('seeking_venue')
+    is_seeking = False
+    if seeking_venue:
+        is_seeking = True
+    else:
+        pass
+
+    try:
+        artist = Artist.query.get(artist_id)
+        artist.name = request.form['name']
+        artist.city = request.form['city']
+        artist.state = request.form['state']
+        artist.phone = request.form['phone']
+        artist.genres = genres_named(request.form.getlist('genres'))
+        artist.facebook_link = request.form['facebook_link']
+        artist.website_link = request.form['website_link']
+        image_changed = artist.image_link != request.form['image_link']
+        artist.image_link = request.form['image_link']
+        artist.seeking_venue = is_seeking
+        artist.seeking_description = request.form['seeking_description']
+        artist.updated_at = utcnow()
+        if image_changed:
+            queue_image_check(artist)
+        db.session.commit()
+        cache.invalidate(*artist_cache_tags(artist_id))
+        flash('Artist ' + request.form['name'] + ' was successfully changed!')
+    except:
+        flash('An error occurred. Artist ' + request.form['name'] + ' could not be changed.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+
+    seeking_venue = request.form.get('seeking_venue')
+
+    is_seeking = False
+    if seeking_venue:
+        is_seeking = True
+    else:
+        pass
+    try:
+        artist = Artist(name=request.form['name'], city=request.form['city'],
+                        state=request.form['state'], phone=request.form['phone'],
+                        genres=genres_named(request.form.getlist('genres')), facebook_link=request.form['facebook_link'],
+                        website_link=request.form['website_link'],
+                        image_link=request.form['image_link'],
+                        seeking_venue=is_seeking,
+                        seeking_description=request.form['seeking_description'])
+        db.session.add(artist)
+        db.session.flush()
+        queue_image_check(artist)
+        db.session.commit()
+        cache.invalidate('artists')
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    except:
+        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+    finally:
+        db.session.close()
+
+    # on successful db insert, flash success
+    # flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+    return render_template('pages/home.html')
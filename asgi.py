@@ -0,0 +1,171 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:app --workers 4
+#
+# The event loop owns the sockets: slow clients, keep-alive connections and
+# request bodies cost no thread. Each request is handed to the (unchanged,
+# synchronous) Flask app on a pool of ASGI_THREADS threads, and the loop is
+# passed along in the environ so views can run independent queries
+# concurrently through aio.gather(). Response chunks are queued back to the
+# loop, so a thread is free again as soon as the view returns; a streamed
+# response holds its thread while it is sent, at most QUEUE_CHUNKS ahead of
+# the client.
+#----------------------------------------------------------------------------#
+
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from aio import LOOP_KEY
+from extensions import aio
+from main import create_app
+
+# request bodies above this size are spooled to disk
+SPOOL_BYTES = 1024 * 1024
+
+# marks the end of a response on the chunk queue
+DONE = object()
+
+# response chunks that may wait for a slow client before the app is paused
+QUEUE_CHUNKS = 16
+
+
+def build_environ(scope, body):
+    # a PEP 3333 environ for an ASGI http scope
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+      "REQUEST_METHOD": scope['method'],
+      "SCRIPT_NAME": scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+      "PATH_INFO": scope['path'].encode('utf-8').decode('latin-1'),
+      "QUERY_STRING": scope['query_string'].decode('latin-1'),
+      "SERVER_NAME": server[0],
+      "SERVER_PORT": str(server[1] or 80),
+      "SERVER_PROTOCOL": 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+      "REMOTE_ADDR": client[0],
+      "REMOTE_PORT": str(client[1]),
+      "wsgi.version": (1, 0),
+      "wsgi.url_scheme": scope.get('scheme', 'http'),
+      "wsgi.input": body,
+      "wsgi.errors": sys.stderr,
+      "wsgi.multithread": True,
+      "wsgi.multiprocess": True,
+      "wsgi.run_once": False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+class ASGIAdapter(object):
+
+    def __init__(self, wsgi_app, threads=None):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(threads or wsgi_app.config['ASGI_THREADS'],
+                                           thread_name_prefix='fyyur-asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError('unsupported ASGI scope type {}'.format(scope['type']))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({"type": 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await aio.dispose(self.wsgi_app)
+                self.executor.shutdown(wait=True)
+                await send({"type": 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = SpooledTemporaryFile(SPOOL_BYTES)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                body.seek(0)
+                return body
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body)
+        environ[LOOP_KEY] = loop
+        chunks = asyncio.Queue(QUEUE_CHUNKS)
+        abandoned = threading.Event()
+
+        def put(item):
+            # blocks this pool thread while the queue is full; once the client
+            # is gone the app is stopped at its next chunk
+            if item is not DONE and abandoned.is_set():
+                raise ConnectionAbortedError('client disconnected')
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+        def run():
+            # runs the WSGI app on a pool thread; everything it produces goes
+            # through the queue, starting with the status and headers
+            def start_response(status, headers, exc_info=None):
+                put((int(status.split(' ', 1)[0]),
+                     [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]))
+                return lambda data: put(bytes(data))
+
+            try:
+                iterable = self.wsgi_app(environ, start_response)
+                try:
+                    for data in iterable:
+                        if data:
+                            put(bytes(data))
+                finally:
+                    if hasattr(iterable, 'close'):
+                        iterable.close()
+            finally:
+                body.close()
+                put(DONE)
+
+        finished = loop.run_in_executor(self.executor, run)
+        item = None
+        try:
+            item = await chunks.get()
+            if item is DONE:
+                # the app raised before starting a response
+                await finished
+                return
+            status, headers = item
+            await send({"type": 'http.response.start', "status": status, "headers": headers})
+            while True:
+                item = await chunks.get()
+                if item is DONE:
+                    break
+                await send({"type": 'http.response.body', "body": item, "more_body": True})
+            await send({"type": 'http.response.body', "body": b''})
+        except BaseException:
+            # sending failed or the request was cancelled: let the app thread
+            # run to its end rather than leave it blocked on a full queue
+            abandoned.set()
+            while item is not DONE:
+                item = await chunks.get()
+            await asyncio.wait([finished])
+            raise
+        await finished
+
+
+app = ASGIAdapter(create_app())
@@ -0,0 +1,234 @@
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+# `flask fyyur build-assets` concatenates and minifies the stylesheets and
+# scripts of layouts/main.html (BUNDLES), then copies them and every other
+# file under static/ into ASSETS_DIR with a content hash in the name, plus
+# .gz copies (and .br ones, with the brotli package) of the compressible
+# files. manifest.json there maps each logical name to its hashed one.
+#
+# Templates link through asset_url()/asset_urls(): hashed ASSETS_URL_PATH
+# URLs once built, the plain /static/ files before, so development needs no
+# build. A hashed name changes whenever its content does, so those files are
+# served with an immutable, year-long Cache-Control, in the best encoding the
+# client accepts. Old hashed files are left in place for pages still cached
+# by clients during a deploy.
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import abort, current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST = 'manifest.json'
+
+# bundle -> the static files it is made of, in load order
+BUNDLES = {
+  "css/app.css": [
+    'css/bootstrap.min.css',
+    'css/layout.main.css',
+    'css/main.css',
+    'css/main.responsive.css',
+    'css/main.quickfix.css',
+  ],
+  "js/head.js": [
+    'js/libs/modernizr-2.8.2.min.js',
+    'js/libs/moment.min.js',
+  ],
+  "js/app.js": [
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/bootstrap-3.1.1.min.js',
+    'js/plugins.js',
+    'js/script.js',
+  ],
+}
+
+# precompressed variants, best first: (Accept-Encoding token, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# extensions worth compressing; images and woff fonts already are
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.eot', '.ttf', '.otf', '.ico'}
+COMPRESS_MIN_BYTES = 256
+
+# strings and /*! licences are kept verbatim by both passes
+CSS_KEEP = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*!.*?\*/'
+CSS_SPACE = re.compile(r'({})|/\*.*?\*/|(\s+)'.format(CSS_KEEP), re.S)
+CSS_PUNCTUATION = re.compile(r'({})| ?([{{}};,]) ?'.format(CSS_KEEP), re.S)
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(source):
+    # drops comments (but /*! licences) and collapses whitespace, leaving
+    # strings alone; spaces around ':' and combinators are kept, since
+    # "a :hover" and "a:hover" differ
+    css = CSS_SPACE.sub(lambda match: match.group(1) or (' ' if match.group(2) else ''), source)
+    css = CSS_PUNCTUATION.sub(lambda match: match.group(1) or match.group(2), css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    # line-level only: without a parser, joining lines could change how
+    # statements end. Indentation, blank lines and whole-line // comments
+    # (source map links included, which would point at the wrong file) go.
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def hashed_name(name, content):
+    root, ext = posixpath.splitext(name)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def rewrite_urls(css, source, bundle, manifest, static_url):
+    # url()s are relative to the source file; point them at the hashed
+    # copies from the bundle's directory, or at /static/ for missing files
+    def replace(match):
+        ref = match.group(2).strip()
+        if ref.startswith(('data:', '/', '#')) or '://' in ref:
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', ref).groups()
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        if target in manifest:
+            ref = posixpath.relpath(manifest[target], posixpath.dirname(bundle)) + suffix
+        else:
+            ref = '{}/{}{}'.format(static_url, target, suffix)
+        return 'url("{}")'.format(ref)
+    return CSS_URL.sub(replace, css)
+
+
+def compressors():
+    # file suffix -> compress function, for the encodings available here
+    found = {".gz": lambda content: gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        found[".br"] = lambda content: brotli.compress(content, quality=11)
+    return found
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as out:
+        out.write(content)
+    os.replace(path + '.tmp', path)
+
+
+def write_asset(out_dir, name, content):
+    # content-addressed, so files already there are already right
+    path = os.path.join(out_dir, *name.split('/'))
+    if not os.path.exists(path):
+        write_file(path, content)
+    if posixpath.splitext(name)[1] not in COMPRESSIBLE or len(content) < COMPRESS_MIN_BYTES:
+        return
+    for suffix, compress in compressors().items():
+        if not os.path.exists(path + suffix):
+            compressed = compress(content)
+            # a variant no smaller than the original is not worth serving
+            if len(compressed) < len(content):
+                write_file(path + suffix, compressed)
+
+
+def build(static_dir, out_dir, static_url='/static', bundles=BUNDLES):
+    # writes every asset and bundle into out_dir and returns the manifest
+    manifest = {}
+    out_dir = os.path.abspath(out_dir)
+    # plain files first, so the stylesheets can point at hashed fonts/images
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and os.path.abspath(os.path.join(root, d)) != out_dir)
+        for filename in sorted(files):
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            with open(path, 'rb') as source:
+                content = source.read()
+            manifest[name] = hashed_name(name, content)
+            write_asset(out_dir, manifest[name], content)
+    for bundle, sources in bundles.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_dir, *source.split('/')), encoding='utf-8') as f:
+                text = f.read()
+            if bundle.endswith('.css'):
+                parts.append(minify_css(rewrite_urls(text, source, bundle, manifest, static_url)))
+            else:
+                parts.append(minify_js(text))
+        # ';' keeps a script without a trailing one from running into the next
+        content = ('\n' if bundle.endswith('.css') else '\n;\n').join(parts).encode('utf-8') + b'\n'
+        manifest[bundle] = hashed_name(bundle, content)
+        write_asset(out_dir, manifest[bundle], content)
+    write_file(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+class Assets(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_DIR', os.path.join(app.static_folder, 'dist'))
+        app.config.setdefault('ASSETS_URL_PATH', '/assets')
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        app.extensions['assets'] = {"manifest": self.load(app)}
+        app.add_url_rule(app.config['ASSETS_URL_PATH'] + '/<path:filename>', 'assets', self.send)
+        app.add_template_global(self.url, 'asset_url')
+        app.add_template_global(self.urls, 'asset_urls')
+
+    def load(self, app):
+        # read once per worker: a build happens before the workers start
+        try:
+            with open(os.path.join(app.config['ASSETS_DIR'], MANIFEST)) as manifest:
+                return json.load(manifest)
+        except FileNotFoundError:
+            return {}
+
+    def build(self, app):
+        manifest = build(app.static_folder, app.config['ASSETS_DIR'], app.static_url_path)
+        app.extensions['assets']['manifest'] = manifest
+        return manifest
+
+    def url(self, name):
+        # URL of a static file or bundle: hashed when built, else under /static/
+        hashed = current_app.extensions['assets']['manifest'].get(name)
+        if hashed is not None:
+            return url_for('assets', filename=hashed)
+        if name in BUNDLES:
+            raise ValueError('bundle {} is not built; link it with asset_urls()'.format(name))
+        return url_for('static', filename=name)
+
+    def urls(self, name):
+        # a bundle's URL once built, else one per source file
+        if name in BUNDLES and name not in current_app.extensions['assets']['manifest']:
+            return [url_for('static', filename=source) for source in BUNDLES[name]]
+        return [self.url(name)]
+
+    def send(self, filename):
+        if filename == MANIFEST:
+            abort(404)
+        directory = current_app.config['ASSETS_DIR']
+        encoding = suffix = None
+        for token, variant in ENCODINGS:
+            path = safe_join(directory, filename + variant)
+            if request.accept_encodings[token] and path is not None and os.path.isfile(path):
+                encoding, suffix = token, variant
+                break
+        # the hashed name is the content's identity, so it makes a strong ETag
+        response = send_from_directory(directory, filename + (suffix or ''),
+                                       mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                                       etag=filename + (suffix or ''), max_age=current_app.config['ASSETS_MAX_AGE'])
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        if encoding is not None:
+            response.content_encoding = encoding
+        return response
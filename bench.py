@@ -0,0 +1,219 @@
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#
+# Drives every route through the Flask test client against the configured
+# database (DATABASE_URL) and reports p50/p95/p99 latency, SQL statements per
+# request and peak Python memory allocated while serving each route. Seed the database first, e.g.
+#
+#   export DATABASE_URL=sqlite:///bench.db
+#   flask fyyur seed --shows 100000
+#   python bench.py --save bench-baseline.json
+#   python bench.py --compare bench-baseline.json
+#
+# --compare exits non-zero when a route got slower or allocates more memory
+# than the tolerances allow, or issues more statements than in the baseline. The write routes really
+# write, so point it at a throwaway database.
+#----------------------------------------------------------------------------#
+
+import argparse
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from extensions import cache
+from main import create_app
+from models import db, Venue, Artist, Show
+
+
+def venue_form(venue):
+    return {
+      "name": venue.name, "city": venue.city, "state": venue.state, "address": venue.address or '',
+      "phone": venue.phone or '', "genres": [genre.name for genre in venue.genres],
+      "facebook_link": venue.facebook_link or '', "image_link": venue.image_link or '',
+      "website_link": venue.website_link or '', "seeking_description": venue.seeking_description or ''
+    }
+
+
+def artist_form(artist):
+    return {
+      "name": artist.name, "city": artist.city, "state": artist.state, "phone": artist.phone or '',
+      "genres": [genre.name for genre in artist.genres], "facebook_link": artist.facebook_link or '',
+      "image_link": artist.image_link or '', "website_link": artist.website_link or '',
+      "seeking_description": artist.seeking_description or ''
+    }
+
+
+def routes():
+    # (name, method, path, form data, setup); setup runs untimed before each
+    # request and may return (path, data) to use instead.
+    venue = Venue.query.order_by(Venue.upcoming_shows_count.desc()).first()
+    artist = Artist.query.order_by(Artist.upcoming_shows_count.desc()).first()
+    if venue is None or artist is None:
+        sys.exit('The database is empty; run `flask fyyur seed` first.')
+    show = Show.query.order_by(Show.id).first()
+    # a word of the venue name, or the whole name if it's a single word
+    term = (venue.name.split() or [venue.name])[0]
+
+    def scratch_venue():
+        # a throwaway venue for the delete benchmark
+        scratch = Venue(name='Bench Scratch', city=venue.city, state=venue.state)
+        db.session.add(scratch)
+        db.session.commit()
+        return '/venues/{}/delete'.format(scratch.id), {}
+
+    slots = itertools.count()
+
+    def free_slot():
+        # a new slot per request, or every repeat would be a double booking
+        start_time = datetime(2099, 1, 1, 20) + timedelta(hours=3 * next(slots))
+        return '/shows/create', {"venue_id": show.venue_id, "artist_id": show.artist_id,
+                                 "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    return [
+      ('home', 'GET', '/', None, None),
+      ('venues', 'GET', '/venues', None, None),
+      ('venues_by_genre', 'GET', '/venues?genre={}'.format(venue.genres[0].name if venue.genres else 'Jazz'), None, None),
+      ('venue', 'GET', '/venues/{}'.format(venue.id), None, None),
+      ('search_venues', 'POST', '/venues/search', {"search_term": term}, None),
+      ('create_venue_form', 'GET', '/venues/create', None, None),
+      ('create_venue', 'POST', '/venues/create', dict(venue_form(venue), name='Bench Venue'), None),
+      ('edit_venue_form', 'GET', '/venues/{}/edit'.format(venue.id), None, None),
+      ('edit_venue', 'POST', '/venues/{}/edit'.format(venue.id), venue_form(venue), None),
+      ('delete_venue', 'POST', None, None, scratch_venue),
+      ('artists', 'GET', '/artists', None, None),
+      ('artists_by_letter', 'GET', '/artists?letter={}'.format(artist.name[0]), None, None),
+      ('artist', 'GET', '/artists/{}'.format(artist.id), None, None),
+      ('search_artists', 'POST', '/artists/search', {"search_term": term}, None),
+      ('create_artist_form', 'GET', '/artists/create', None, None),
+      ('create_artist', 'POST', '/artists/create', dict(artist_form(artist), name='Bench Artist'), None),
+      ('edit_artist_form', 'GET', '/artists/{}/edit'.format(artist.id), None, None),
+      ('edit_artist', 'POST', '/artists/{}/edit'.format(artist.id), artist_form(artist), None),
+      ('shows', 'GET', '/shows', None, None),
+      ('past_shows', 'GET', '/shows?when=past', None, None),
+      ('create_show_form', 'GET', '/shows/create', None, None),
+      ('create_show', 'POST', None, None, free_slot),
+      ('show_conflicts', 'GET', '/shows/conflicts?venue_id={}&artist_id={}&start_time={}'.format(
+          show.venue_id, show.artist_id, show.start_time.strftime('%Y-%m-%dT%H:%M')), None, None),
+      ('api_search', 'GET', '/api/search?type=venue&q={}'.format(term[:3]), None, None),
+    ]
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+
+def run(app, requests, warmup, only=None):
+    statements = [0]
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    client = app.test_client()
+    results = {}
+    with app.app_context():
+        table = routes()
+    for name, method, path, data, setup in table:
+        if only and name not in only:
+            continue
+        timings = []
+        queries = []
+        # the peak of the route's own requests, not of the whole process
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        for iteration in range(warmup + requests):
+            if setup is not None:
+                with app.app_context():
+                    path, data = setup()
+            statements[0] = 0
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                sys.exit('{} {} returned {}'.format(method, path, response.status_code))
+            if iteration >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(statements[0])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+          "p50_ms": round(percentile(timings, 0.50), 3),
+          "p95_ms": round(percentile(timings, 0.95), 3),
+          "p99_ms": round(percentile(timings, 0.99), 3),
+          "queries": max(queries),
+          "peak_kb": peak // 1024
+        }
+    event.remove(engine, 'before_cursor_execute', count)
+    return results
+
+
+def regressions(results, baseline, tolerance, floor_ms, memory_tolerance=0.25, floor_kb=64):
+    # a route regresses when its p95 grew by more than `tolerance` (and by at
+    # least `floor_ms`, to ignore noise on very fast routes), its peak memory
+    # grew by more than `memory_tolerance` (and by at least `floor_kb`) or it
+    # issues more statements than before
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance) and result['p95_ms'] - before['p95_ms'] > floor_ms:
+            found.append('{}: p95 {:.1f}ms, baseline {:.1f}ms'.format(name, result['p95_ms'], before['p95_ms']))
+        if result['queries'] > before['queries']:
+            found.append('{}: {} queries, baseline {}'.format(name, result['queries'], before['queries']))
+        # baselines saved before peak_kb was recorded have nothing to compare
+        if 'peak_kb' in before and result['peak_kb'] > before['peak_kb'] * (1 + memory_tolerance) \
+                and result['peak_kb'] - before['peak_kb'] > floor_kb:
+            found.append('{}: peak {} KiB, baseline {} KiB'.format(name, result['peak_kb'], before['peak_kb']))
+    return found
+
+
+def report(results):
+    print('{:<20} {:>9} {:>9} {:>9} {:>8} {:>10}'.format('route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'peak KiB'))
+    for name, result in results.items():
+        print('{:<20} {p50_ms:>9.2f} {p95_ms:>9.2f} {p99_ms:>9.2f} {queries:>8} {peak_kb:>10}'.format(name, **result))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every Fyyur route.')
+    parser.add_argument('-n', '--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per route')
+    parser.add_argument('--route', action='append', help='only run this route (repeatable)')
+    parser.add_argument('--cache', action='store_true', help='leave the response cache on')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='fail if slower than this baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth (default 0.25)')
+    parser.add_argument('--floor', type=float, default=2.0, help='ignore p95 growth under this many ms')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='allowed peak memory growth (default 0.25)')
+    parser.add_argument('--memory-floor', type=int, default=64, help='ignore peak memory growth under this many KiB')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    if not args.cache:
+        cache.backend = None
+    results = run(app, args.requests, args.warmup, args.route)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as baseline:
+            json.dump(results, baseline, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline:
+            found = regressions(results, json.load(baseline), args.tolerance, args.floor,
+                                args.memory_tolerance, args.memory_floor)
+        for line in found:
+            print('REGRESSION ' + line, file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#----------------------------------------------------------------------------#
+# Bulk import/export.
+#
+# Streaming CSV and NDJSON readers/writers used by `flask fyyur import` and
+# `flask fyyur export`. Everything here works on iterators of dicts, so a
+# file of any size is processed in memory bounded by the batch size.
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+FORMATS = ('csv', 'ndjson')
+
+
+class RowError(ValueError):
+    # a row that cannot be imported; the message is reported with the row
+    pass
+
+
+def guess_format(filename, default='ndjson'):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    return default
+
+
+def read_rows(stream, fmt):
+    # yields (line number, row dict); malformed NDJSON lines are yielded as
+    # RowError instances so the caller can reject them without stopping.
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, RowError('invalid JSON: {}'.format(error))
+            continue
+        if not isinstance(row, dict):
+            row = RowError('expected a JSON object')
+        yield line_number, row
+
+
+def serialize(value, fmt):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)) and fmt == 'csv':
+        return ';'.join(value)
+    return value
+
+
+class RowWriter(object):
+
+    def __init__(self, stream, fmt, fieldnames):
+        self.stream = stream
+        self.fmt = fmt
+        self.fieldnames = fieldnames
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(stream, fieldnames=fieldnames, extrasaction='ignore')
+            self.writer.writeheader()
+
+    def write(self, row):
+        row = {key: serialize(row.get(key), self.fmt) for key in self.fieldnames}
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.stream.write(json.dumps(row) + '\n')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def text(row, key, required=False, max_length=None):
+    value = row.get(key)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError('{} is required'.format(key))
+    if max_length is not None and len(value) > max_length:
+        raise RowError('{} is longer than {} characters'.format(key, max_length))
+    return value or None
+
+
+def boolean(row, key):
+    value = row.get(key)
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+
+def names(row, key):
+    # genre lists: a JSON array in NDJSON, 'Jazz;Rock' (or commas) in CSV
+    value = row.get(key) or []
+    if isinstance(value, str):
+        value = value.replace(',', ';').split(';')
+    return sorted(set(str(name).strip() for name in value if str(name).strip()))
@@ -0,0 +1,283 @@
+#----------------------------------------------------------------------------#
+# Response cache.
+#
+# Caches rendered GET responses keyed on path + query string. Every entry is
+# stamped with the current version of the tags it depends on ('venues',
+# 'venue:3', ...); invalidate() bumps those versions, so exactly the pages
+# that depend on a write stop matching without scanning the cache.
+#
+# Backends:
+#   lru   - in-process, bounded by CACHE_MAX_BYTES. A write only
+#           invalidates the process that handled it, so it is refused with
+#           WEB_CONCURRENCY > 1
+#   redis - shared by every worker, needs the optional `redis` package
+#   null  - caching disabled
+#
+# conditional() adds ETag/Last-Modified validation in front of a view so
+# revalidating clients get a 304 without the view running at all. Its ETag
+# is part of the cache key, so a cached body always matches the ETag sent.
+#
+# Fragments: templates wrap per-entity markup (a show tile) in
+#   {% call cached_fragment('show-tile', show.id, show.updated_at) %}
+# and the block renders once per key. Keys carry the entity's updated_at, so
+# they never need invalidating; a page whose response cache entry was
+# dropped by an unrelated write re-renders only the rows that changed.
+# Fragments always live in an in-process LRU (CACHE_FRAGMENT_MAX_BYTES per
+# worker): a network round trip per row would cost more than rendering it.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+
+from flask import g, make_response, request, session
+from jinja2 import Undefined
+
+
+class LRUBackend(object):
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.evictions = 0
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires = entry
+            if expires < time.time():
+                del self.entries[key]
+                self.used_bytes -= size
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size, timeout):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.used_bytes -= old[1]
+            self.entries[key] = (value, size, time.time() + timeout)
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.used_bytes -= evicted_size
+                self.evictions += 1
+
+    def tag_versions(self, tags):
+        with self.lock:
+            return [self.versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {
+              "entries": len(self.entries),
+              "bytes": self.used_bytes,
+              "max_bytes": self.max_bytes,
+              "evictions": self.evictions
+            }
+
+
+class RedisBackend(object):
+
+    def __init__(self, url, prefix):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_TYPE = 'redis' requires the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, size, timeout):
+        self.client.set(key, pickle.dumps(value), ex=int(timeout))
+
+    def tag_versions(self, tags):
+        return [int(version or 0) for version in self.client.mget(['{}:tag:{}'.format(self.prefix, tag) for tag in tags])]
+
+    def bump(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr('{}:tag:{}'.format(self.prefix, tag))
+        pipe.execute()
+
+    def stats(self):
+        # redis evicts on its own (maxmemory-policy); report what it tracks
+        info = self.client.info('stats')
+        return {
+          "entries": self.client.dbsize(),
+          "evictions": info.get('evicted_keys', 0)
+        }
+
+
+class Cache(object):
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.fragments = None
+        self.hits = 0
+        self.misses = 0
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'lru')
+        app.config.setdefault('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_KEY_PREFIX', 'fyyur')
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('CACHE_FRAGMENT_MAX_BYTES', 16 * 1024 * 1024)
+        app.config.setdefault('WEB_CONCURRENCY', 1)
+
+        self.prefix = app.config['CACHE_KEY_PREFIX']
+        self.default_timeout = app.config['CACHE_DEFAULT_TIMEOUT']
+        if app.config['CACHE_TYPE'] == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'], self.prefix)
+        elif app.config['CACHE_TYPE'] == 'lru':
+            if app.config['WEB_CONCURRENCY'] > 1:
+                raise RuntimeError("CACHE_TYPE = 'lru' is per process, but WEB_CONCURRENCY = {}: the other "
+                                   "workers would keep serving pages a write invalidated. Use 'redis' or 'null'."
+                                   .format(app.config['WEB_CONCURRENCY']))
+            self.backend = LRUBackend(app.config['CACHE_MAX_BYTES'])
+        else:
+            self.backend = None
+        if app.config['CACHE_TYPE'] != 'null' and app.config['CACHE_FRAGMENT_MAX_BYTES']:
+            self.fragments = LRUBackend(app.config['CACHE_FRAGMENT_MAX_BYTES'])
+        app.add_template_global(self.fragment, 'cached_fragment')
+        app.extensions['cache'] = self
+
+    def key(self, tags):
+        versions = self.backend.tag_versions(tags)
+        args = '&'.join('{}={}'.format(k, v) for k, v in sorted(request.args.items(multi=True)))
+        # under conditional(), the ETag too: with the per-worker LRU backend a
+        # write bumps tags in its own worker only, and another worker's stale
+        # copy would otherwise go out under the new ETag, for clients to keep
+        return '{}:page:{}?{}:{}:{}'.format(self.prefix, request.path, args, '.'.join(map(str, versions)),
+                                            g.get('cache_etag', ''))
+
+    def cached(self, *tags, timeout=None):
+        # caches a GET view's 200 responses. `tags` may use the view's
+        # arguments, e.g. 'venue:{venue_id}'.
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # flashed messages are rendered into the page, so never serve
+                # or store a cached copy while one is pending
+                if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+
+                key = self.key([tag.format(**kwargs) for tag in tags])
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.record(hit=True)
+                    body, mimetype = entry
+                    return body, 200, {'Content-Type': mimetype, 'X-Cache': 'HIT'}
+
+                self.record(hit=False)
+                response = view(**kwargs)
+                if isinstance(response, str):
+                    body = response.encode('utf-8')
+                    self.backend.set(key, (body, 'text/html; charset=utf-8'), len(body),
+                                     timeout or self.default_timeout)
+                    return body, 200, {'Content-Type': 'text/html; charset=utf-8', 'X-Cache': 'MISS'}
+                return response
+            return wrapper
+        return decorator
+
+    def fragment(self, name, *version, caller):
+        # the rendered body of a {% call cached_fragment(name, ...) %} block;
+        # everything the block shows must be covered by `version`
+        if self.fragments is None:
+            return caller()
+        if any(isinstance(part, Undefined) for part in version):
+            # a misspelt or missing field would make every row share one key
+            raise ValueError('cached_fragment({!r}) has an undefined key part'.format(name))
+        key = (name,) + version
+        html = self.fragments.get(key)
+        if html is not None:
+            self.record(hit=True, fragment=True)
+            return html
+        self.record(hit=False, fragment=True)
+        html = caller()
+        self.fragments.set(key, html, len(html), self.default_timeout)
+        return html
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.bump(tags)
+
+    def record(self, hit, fragment=False):
+        with self.lock:
+            if fragment and hit:
+                self.fragment_hits += 1
+            elif fragment:
+                self.fragment_misses += 1
+            elif hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        stats = {"hits": self.hits, "misses": self.misses,
+                 "fragment_hits": self.fragment_hits, "fragment_misses": self.fragment_misses}
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
+
+
+def conditional(validator):
+    # `validator(**view_kwargs)` returns (last_modified, token) from a cheap
+    # query, or None to skip validation (e.g. unknown id, the view will 404).
+    # The ETag is a hash of the token, so anything that changes the page must
+    # change the token.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(**kwargs)
+            version = validator(**kwargs)
+            if version is None:
+                return view(**kwargs)
+
+            last_modified, token = version
+            if last_modified is not None and last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            etag = hashlib.sha1(repr(token).encode('utf-8')).hexdigest()[:20]
+            # part of the response cache key, see Cache.key
+            g.cache_etag = etag
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(etag)
+            else:
+                fresh = (request.if_modified_since is not None and last_modified is not None
+                         and last_modified.replace(microsecond=0) <= request.if_modified_since)
+            response = make_response('', 304) if fresh else make_response(view(**kwargs))
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,451 @@
+#----------------------------------------------------------------------------#
+# Commands.
+#
+# `flask fyyur ...`; main.create_app() adds the group to the CLI.
+#----------------------------------------------------------------------------#
+
+import json
+import random
+import signal
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.orm import selectinload
+
+import bulk
+import schedule
+import search
+import seed
+from assets import compressors
+from extensions import assets, cache, jobs
+from models import db, Genre, Venue, Artist, Show, venue_genres, artist_genres, utcnow, refresh_show_counts
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+@fyyur_cli.command('roll-forward')
+@click.option('--window', default=3600, show_default=True,
+              help='Seconds back from now to look for shows that have started.')
+def roll_forward(window):
+    """Move shows that have started from the upcoming to the past counters.
+
+    Run it periodically (e.g. from cron every few minutes) with a window
+    comfortably longer than the schedule interval; recounting is idempotent.
+    """
+    now = datetime.now(timezone.utc)
+    started = Show.query.with_entities(Show.venue_id, Show.artist_id).filter(
+        Show.start_time > now - timedelta(seconds=window), Show.start_time <= now
+    ).all()
+    refresh_show_counts(db.session, [row.venue_id for row in started], [row.artist_id for row in started], now)
+    db.session.commit()
+    click.echo('Rolled forward {} shows.'.format(len(started)))
+
+
+@fyyur_cli.command('verify-counters')
+@click.option('--fix', is_flag=True, help='Rewrite drifted counters with the recomputed values.')
+def verify_counters(fix):
+    """Recompute every show counter and report drift from the stored values."""
+    now = datetime.now(timezone.utc)
+    drifted = {Venue: [], Artist: []}
+
+    for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        actual = db.session.query(
+            column,
+            db.func.sum(db.case((Show.start_time > now, 1), else_=0)),
+            db.func.sum(db.case((Show.start_time <= now, 1), else_=0))
+        ).filter(column.isnot(None)).group_by(column)
+        actual = {owner_id: (upcoming, past) for owner_id, upcoming, past in actual}
+
+        stored = model.query.with_entities(model.id, model.upcoming_shows_count, model.past_shows_count)
+        for owner_id, upcoming, past in stored.yield_per(1000):
+            expected = actual.get(owner_id, (0, 0))
+            if (upcoming, past) != expected:
+                drifted[model].append(owner_id)
+                click.echo('{} {}: stored upcoming={} past={}, actual upcoming={} past={}'.format(
+                    model.__tablename__, owner_id, upcoming, past, *expected))
+
+    total = len(drifted[Venue]) + len(drifted[Artist])
+    if fix and total:
+        refresh_show_counts(db.session, drifted[Venue], drifted[Artist], now)
+        db.session.commit()
+    click.echo('{} counters drifted{}.'.format(total, ', fixed' if fix and total else ''))
+    if total and not fix:
+        raise SystemExit(1)
+
+
+#  Bulk import/export
+#  ----------------------------------------------------------------
+
+VENUE_FIELDS = ['id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                'facebook_link', 'website_link', 'seeking_talent', 'seeking_description']
+ARTIST_FIELDS = ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_venue', 'seeking_description']
+SHOW_FIELDS = ['id', 'start_time', 'end_time', 'venue_id', 'venue_name', 'venue_city', 'venue_state',
+               'artist_id', 'artist_name']
+
+
+def venue_params(row):
+    return {
+      "name": bulk.text(row, 'name', required=True),
+      "city": bulk.text(row, 'city', required=True, max_length=120),
+      "state": bulk.text(row, 'state', required=True, max_length=120),
+      "address": bulk.text(row, 'address', max_length=120),
+      "phone": bulk.text(row, 'phone', max_length=120),
+      "image_link": bulk.text(row, 'image_link'),
+      "facebook_link": bulk.text(row, 'facebook_link'),
+      "website_link": bulk.text(row, 'website_link', max_length=500),
+      "seeking_talent": bulk.boolean(row, 'seeking_talent'),
+      "seeking_description": bulk.text(row, 'seeking_description'),
+    }
+
+
+def artist_params(row):
+    return {
+      "name": bulk.text(row, 'name', required=True),
+      "city": bulk.text(row, 'city', max_length=120),
+      "state": bulk.text(row, 'state', max_length=120),
+      "phone": bulk.text(row, 'phone', max_length=120),
+      "image_link": bulk.text(row, 'image_link'),
+      "facebook_link": bulk.text(row, 'facebook_link', max_length=120),
+      "website_link": bulk.text(row, 'website_link', max_length=500),
+      "seeking_venue": bulk.boolean(row, 'seeking_venue'),
+      "seeking_description": bulk.text(row, 'seeking_description'),
+    }
+
+
+def venue_key(params):
+    return params['name'], params['city'], params['state']
+
+
+def artist_key(params):
+    return params['name']
+
+
+# kind -> (model, genre association table, its owner column, params, natural key, key columns)
+IMPORTERS = {
+  "venues": (Venue, venue_genres, 'venue_id', venue_params, venue_key, lambda: (Venue.name, Venue.city, Venue.state)),
+  "artists": (Artist, artist_genres, 'artist_id', artist_params, artist_key, lambda: (Artist.name,)),
+}
+
+
+def key_ids(key_columns, keys):
+    # natural key -> list of matching ids, for a batch of keys in one query
+    if not keys:
+        return {}
+    key = db.tuple_(*key_columns) if len(key_columns) > 1 else key_columns[0]
+    model = key_columns[0].class_
+    found = {}
+    for row in db.session.query(model.id, *key_columns).filter(key.in_(list(keys))):
+        found.setdefault(tuple(row[1:]) if len(key_columns) > 1 else row[1], []).append(row.id)
+    return found
+
+
+def genre_ids(names):
+    # Genre ids for a batch of names, inserting the missing ones in one statement
+    names = set(names)
+    if not names:
+        return {}
+    found = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names)))
+    missing = [{"name": name} for name in sorted(names - set(found))]
+    if missing:
+        db.session.execute(Genre.__table__.insert(), missing)
+        found.update(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_([row['name'] for row in missing])))
+    return found
+
+
+def import_owner_batch(kind, batch, reject):
+    # inserts one batch of venues or artists with executemany, skipping rows
+    # whose natural key already exists. Returns the number inserted.
+    model, association, owner_column, params_for, key_for, key_columns = IMPORTERS[kind]
+    pending = {}
+    for line_number, row in batch:
+        try:
+            if isinstance(row, bulk.RowError):
+                raise row
+            params = params_for(row)
+            genres = bulk.names(row, 'genres')
+        except bulk.RowError as error:
+            reject(line_number, row, error)
+            continue
+        key = key_for(params)
+        if key in pending:
+            reject(line_number, row, 'duplicate of line {}'.format(pending[key][0]))
+            continue
+        pending[key] = (line_number, row, params, genres)
+
+    existing = key_ids(key_columns(), pending.keys())
+    for key in list(pending):
+        if key in existing:
+            line_number, row, _, _ = pending.pop(key)
+            reject(line_number, row, 'already exists')
+    if not pending:
+        return 0
+
+    now = utcnow()
+    db.session.execute(model.__table__.insert(), [dict(params, updated_at=now) for _, _, params, _ in pending.values()])
+    ids = key_ids(key_columns(), pending.keys())
+    genres = genre_ids(name for _, _, _, names in pending.values() for name in names)
+    links = [{owner_column: ids[key][0], "genre_id": genres[name]}
+             for key, (_, _, _, names) in pending.items() for name in names]
+    if links:
+        db.session.execute(association.insert(), links)
+    db.session.commit()
+    return len(pending)
+
+
+def show_reference(row, kind):
+    # ('id', 3) when the row names the venue/artist by id, else ('key', natural key)
+    kind_id = bulk.text(row, kind + '_id')
+    if kind_id:
+        try:
+            return 'id', int(kind_id)
+        except ValueError:
+            raise bulk.RowError('{}_id must be an integer'.format(kind))
+    if kind == 'venue':
+        return 'key', (bulk.text(row, 'venue_name', required=True), bulk.text(row, 'venue_city', required=True),
+                       bulk.text(row, 'venue_state', required=True))
+    return 'key', bulk.text(row, 'artist_name', required=True)
+
+
+def import_show_batch(batch, reject):
+    # inserts one batch of shows, resolving venues and artists by id or
+    # natural key with one query per kind, and rejecting shows that overlap
+    # a stored show or an earlier row of the same venue or artist. Returns
+    # the number inserted.
+    parsed = []
+    for line_number, row in batch:
+        try:
+            if isinstance(row, bulk.RowError):
+                raise row
+            start_time = bulk.text(row, 'start_time', required=True)
+            end_time = bulk.text(row, 'end_time')
+            try:
+                start_time, end_time = schedule.show_times(start_time, end_time)
+            except schedule.ScheduleError as error:
+                raise bulk.RowError(str(error))
+            except (ValueError, OverflowError):
+                raise bulk.RowError('start_time or end_time is not a date')
+            parsed.append((line_number, row, (start_time, end_time), show_reference(row, 'venue'),
+                           show_reference(row, 'artist')))
+        except bulk.RowError as error:
+            reject(line_number, row, error)
+
+    resolved = {}
+    for kind, model, key_columns in (('venue', Venue, (Venue.name, Venue.city, Venue.state)), ('artist', Artist, (Artist.name,))):
+        refs = [entry[3 if kind == 'venue' else 4] for entry in parsed]
+        ids = [value for how, value in refs if how == 'id']
+        known = set(row.id for row in db.session.query(model.id).filter(model.id.in_(ids))) if ids else set()
+        resolved[kind] = dict((('id', value), [value]) for value in known)
+        resolved[kind].update((('key', key), found) for key, found in
+                              key_ids(key_columns, [value for how, value in refs if how == 'key']).items())
+
+    candidates = []
+    for line_number, row, times, venue_ref, artist_ref in parsed:
+        venue_ids = resolved['venue'].get(venue_ref, [])
+        artist_ids = resolved['artist'].get(artist_ref, [])
+        if len(venue_ids) != 1:
+            reject(line_number, row, 'venue not found' if not venue_ids else 'venue is ambiguous')
+        elif len(artist_ids) != 1:
+            reject(line_number, row, 'artist not found' if not artist_ids else 'artist is ambiguous')
+        else:
+            candidates.append((line_number, row, {"start_time": times[0], "end_time": times[1],
+                                                  "venue_id": venue_ids[0], "artist_id": artist_ids[0]}))
+    if not candidates:
+        return 0
+
+    booked = schedule.Schedule()
+    booked.load(db.session, min(show['start_time'] for _, _, show in candidates),
+                max(show['end_time'] for _, _, show in candidates),
+                venue_ids=set(show['venue_id'] for _, _, show in candidates),
+                artist_ids=set(show['artist_id'] for _, _, show in candidates))
+    shows = []
+    for line_number, row, show in candidates:
+        clash = booked.conflict(**show)
+        if clash is not None:
+            reject(line_number, row, clash)
+        else:
+            booked.book(**show)
+            shows.append(show)
+    if not shows:
+        return 0
+
+    now = utcnow()
+    db.session.execute(Show.__table__.insert(), [dict(show, updated_at=now) for show in shows])
+    venue_ids = set(show['venue_id'] for show in shows)
+    artist_ids = set(show['artist_id'] for show in shows)
+    # Core inserts bypass the flush listener, so recount the touched rows
+    refresh_show_counts(db.session, venue_ids, artist_ids)
+    db.session.commit()
+    cache.invalidate(*['venue:{}'.format(venue_id) for venue_id in venue_ids] +
+                     ['artist:{}'.format(artist_id) for artist_id in artist_ids])
+    return len(shows)
+
+
+def export_rows(kind):
+    # streams every row of `kind` as a dict, a server-side batch at a time
+    if kind == 'shows':
+        rows = db.session.query(
+            Show.id, Show.start_time, Show.end_time, Show.venue_id, Venue.name.label('venue_name'),
+            Venue.city.label('venue_city'), Venue.state.label('venue_state'),
+            Show.artist_id, Artist.name.label('artist_name')
+        ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).order_by(Show.id)
+        for row in rows.yield_per(1000):
+            yield row._asdict()
+        return
+
+    model = Venue if kind == 'venues' else Artist
+    fields = VENUE_FIELDS if kind == 'venues' else ARTIST_FIELDS
+    for instance in model.query.options(selectinload(model.genres)).order_by(model.id).yield_per(1000):
+        row = {field: getattr(instance, field) for field in fields if field != 'genres'}
+        row['genres'] = [genre.name for genre in instance.genres]
+        yield row
+
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('source')
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per insert and commit.')
+@click.option('--rejects', type=click.File('w'),
+              help='Write rejected rows here as NDJSON with an "error" field.')
+def import_command(kind, source, fmt, batch_size, rejects):
+    """Import venues, artists or shows from a CSV or NDJSON file ('-' for stdin).
+
+    Rows are inserted in batches, one commit per batch. Rows that fail
+    validation, duplicate an existing venue/artist or reference an unknown
+    venue/artist are reported and skipped. Shows name their venue by
+    venue_id or venue_name/venue_city/venue_state and their artist by
+    artist_id or artist_name; end_time is optional, and shows overlapping
+    another show of their venue or artist are rejected.
+    """
+    fmt = fmt or bulk.guess_format(source)
+    stream = sys.stdin if source == '-' else open(source, newline='', encoding='utf-8')
+    rejected = [0]
+
+    def reject(line_number, row, error):
+        rejected[0] += 1
+        if rejects is not None:
+            record = dict(row) if isinstance(row, dict) else {}
+            rejects.write(json.dumps(dict(record, line=line_number, error=str(error)), default=str) + '\n')
+        else:
+            click.echo('line {}: {}'.format(line_number, error), err=True)
+
+    imported = 0
+    with stream:
+        for batch in bulk.batched(bulk.read_rows(stream, fmt), batch_size):
+            if kind == 'shows':
+                imported += import_show_batch(batch, reject)
+            else:
+                imported += import_owner_batch(kind, batch, reject)
+
+    if kind != 'shows':
+        search.reindex(db.session, IMPORTERS[kind][0])
+        db.session.commit()
+    cache.invalidate(kind, 'venues', 'shows')
+    click.echo('Imported {} {}, rejected {} rows.'.format(imported, kind, rejected[0]))
+
+
+@fyyur_cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('destination', default='-')
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS),
+              help='Output format; guessed from the file extension by default.')
+def export_command(kind, destination, fmt):
+    """Export venues, artists or shows as CSV or NDJSON ('-' for stdout)."""
+    fmt = fmt or bulk.guess_format(destination)
+    fields = {"venues": VENUE_FIELDS, "artists": ARTIST_FIELDS, "shows": SHOW_FIELDS}[kind]
+    stream = sys.stdout if destination == '-' else open(destination, 'w', newline='', encoding='utf-8')
+    with stream:
+        writer = bulk.RowWriter(stream, fmt, fields)
+        for row in export_rows(kind):
+            writer.write(row)
+
+
+@fyyur_cli.command('compile-templates')
+def compile_templates():
+    """Compile every template into the TEMPLATE_CACHE_DIR bytecode cache.
+
+    Run it at deploy time, before starting the workers, so no worker parses
+    a template on its first requests.
+    """
+    app = current_app._get_current_object()
+    if app.jinja_env.bytecode_cache is None:
+        raise click.ClickException('TEMPLATE_CACHE_DIR is not set; there is nowhere to keep compiled templates.')
+    names = app.jinja_env.list_templates(extensions=('html',))
+    for name in names:
+        app.jinja_env.get_template(name)
+    click.echo('Compiled {} templates into {}.'.format(len(names), app.config['TEMPLATE_CACHE_DIR']))
+
+
+@fyyur_cli.command('build-assets')
+def build_assets():
+    """Bundle, minify, fingerprint and precompress the files under static/.
+
+    Run it at deploy time, before starting the workers; they read the
+    manifest once at startup.
+    """
+    app = current_app._get_current_object()
+    manifest = assets.build(app)
+    click.echo('Built {} assets into {} (precompressed: {}).'.format(
+        len(manifest), app.config['ASSETS_DIR'], ', '.join(sorted(compressors()))))
+
+
+@fyyur_cli.command('worker')
+@click.option('--concurrency', default=4, show_default=True, help='Jobs run at once (threads).')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more.')
+def worker_command(concurrency, burst):
+    """Run queued background jobs until interrupted.
+
+    Start as many workers as you like; they never take the same job. Each
+    thread holds a database connection while it runs a job, so keep
+    --concurrency within the pool (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+    """
+    app = current_app._get_current_object()
+    stop = threading.Event()
+    # SIGTERM/Ctrl-C: finish the jobs in hand, then exit
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    counts = jobs.work(app, concurrency=concurrency, burst=burst, stop=stop)
+    click.echo('{done} jobs done, {retry} to be retried, {failed} failed.'.format(**counts))
+
+
+@fyyur_cli.command('seed')
+@click.option('--shows', 'show_count', default=1000, show_default=True, help='Number of shows to create.')
+@click.option('--venues', 'venue_count', type=int, help='Number of venues (default: one per 100 shows).')
+@click.option('--artists', 'artist_count', type=int, help='Number of artists (default: one per 50 shows).')
+@click.option('--seed', 'seed_value', default=0, show_default=True, help='Random seed; the same seed gives the same data.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per insert and commit.')
+def seed_command(show_count, venue_count, artist_count, seed_value, batch_size):
+    """Fill the database with reproducible synthetic venues, artists and shows."""
+    rng = random.Random(seed_value)
+    venue_count = venue_count or max(1, show_count // 100)
+    artist_count = artist_count or max(1, show_count // 50)
+
+    def reject(line_number, row, error):
+        click.echo('{} {}: {}'.format(kind, row.get('name'), error), err=True)
+
+    for kind, rows in (('venues', seed.venue_rows(rng, venue_count)), ('artists', seed.artist_rows(rng, artist_count))):
+        for batch in bulk.batched(enumerate(rows, 1), batch_size):
+            import_owner_batch(kind, batch, reject)
+        search.reindex(db.session, IMPORTERS[kind][0])
+        db.session.commit()
+
+    venue_ids = [row.id for row in db.session.query(Venue.id)]
+    artist_ids = [row.id for row in db.session.query(Artist.id)]
+    now = utcnow()
+    # shows already stored in the seeded window are kept clear of
+    booked = schedule.Schedule()
+    booked.load(db.session, now - timedelta(days=seed.SHOW_DAYS), now + timedelta(days=seed.SHOW_DAYS + 1))
+    for batch in bulk.batched(seed.show_rows(rng, show_count, venue_ids, artist_ids, now, booked), batch_size):
+        db.session.execute(Show.__table__.insert(), [dict(show, updated_at=now) for show in batch])
+        db.session.commit()
+    # counters are recomputed once at the end rather than per batch
+    refresh_show_counts(db.session, venue_ids, artist_ids)
+    db.session.commit()
+    cache.invalidate('venues', 'artists', 'shows')
+    click.echo('Seeded {} venues, {} artists and {} shows.'.format(venue_count, artist_count, show_count))
@@ -0,0 +1,221 @@
+#----------------------------------------------------------------------------#
+# Response compression.
+#
+# A WSGI middleware in front of the app: HTML, JSON, CSS and the like are
+# sent gzip- or brotli-encoded, whichever the client's Accept-Encoding
+# prefers (brotli needs the Brotli package). Bodies under COMPRESS_MIN_BYTES
+# are sent as they are, and every compressible response (and any 304 that
+# may stand for one) gets "Vary: Accept-Encoding" so shared caches keep the
+# variants apart.
+#
+# Streamed responses (no Content-Length, e.g. a large /venues) are
+# compressed chunk by chunk with a flush after each, so the client still
+# gets every chunk as soon as it is rendered. Responses that already carry
+# a Content-Encoding, like the precompressed /assets/ files, pass through.
+#----------------------------------------------------------------------------#
+
+import time
+import zlib
+from itertools import chain
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+from metrics import labels
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIMETYPES = frozenset([
+  'text/html',
+  'text/css',
+  'text/plain',
+  'text/csv',
+  'text/javascript',
+  'application/javascript',
+  'application/json',
+  'application/xml',
+  'image/svg+xml',
+])
+
+
+class GzipEncoder(object):
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, flush):
+        out = self.compressor.compress(data)
+        return out + self.compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliEncoder(object):
+
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush):
+        out = self.compressor.process(data)
+        return out + self.compressor.flush() if flush else out
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def add_vary(headers):
+    values = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+    if not any(value == '*' or value.lower() == 'accept-encoding' for value in values):
+        headers['Vary'] = ', '.join(values + ['Accept-Encoding'])
+
+
+class CompressionMiddleware(object):
+
+    def __init__(self, wsgi_app, min_bytes=1400, gzip_level=6, brotli_quality=4, mimetypes=MIMETYPES,
+                 metrics=None):
+        self.wsgi_app = wsgi_app
+        self.min_bytes = min_bytes
+        self.mimetypes = mimetypes
+        self.metrics = metrics
+        # encoding -> encoder factory, best first
+        self.encoders = {}
+        if brotli is not None:
+            self.encoders['br'] = lambda: BrotliEncoder(brotli_quality)
+        self.encoders['gzip'] = lambda: GzipEncoder(gzip_level)
+
+    def negotiate(self, environ):
+        # the client's preferred encoding of ours, or None; on equal
+        # q-values brotli wins
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        return accepted.best_match(list(self.encoders))
+
+    def plan(self, environ, status, headers):
+        # the encoding for this response, or None to send it as it is
+        code = int(status.split(' ', 1)[0])
+        mimetype = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if code == 304:
+            # stands in for a 200 that varied, and caches match the two on
+            # Vary; a 304 may omit Content-Type, so only known other types
+            # go without
+            if not mimetype or mimetype in self.mimetypes:
+                add_vary(headers)
+            return None
+        if (mimetype not in self.mimetypes or code < 200 or code in (204, 206)
+                or 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', '')):
+            return None
+        add_vary(headers)
+        length = headers.get('Content-Length', type=int)
+        if environ['REQUEST_METHOD'] == 'HEAD' or (length is not None and length < self.min_bytes):
+            return None
+        return self.negotiate(environ)
+
+    def __call__(self, environ, start_response):
+        # Flask calls start_response before it returns the body, so the
+        # headers are known here
+        response = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            response.update(status=status, headers=Headers(headers), exc_info=exc_info)
+            return written.append
+
+        app_iter = self.wsgi_app(environ, capture)
+        encoding = self.plan(environ, response['status'], response['headers'])
+        if encoding is None:
+            start_response(response['status'], response['headers'].to_wsgi_list(), response['exc_info'])
+            if not written:
+                return app_iter
+            # the server only closes what it is given: pass app_iter's close on
+            return ClosingIterator(chain(written, app_iter), getattr(app_iter, 'close', None))
+        return self.encode(start_response, encoding, response, written, app_iter)
+
+    def encode(self, start_response, encoding, response, written, app_iter):
+        try:
+            headers = response['headers']
+            chunks = iter(app_iter)
+            head = list(written)
+            streamed = 'Content-Length' not in headers
+            if streamed:
+                # hold the start back until the body is known to reach min_bytes
+                size = sum(map(len, head))
+                for data in chunks:
+                    head.append(data)
+                    size += len(data)
+                    if size >= self.min_bytes:
+                        break
+                else:
+                    headers['Content-Length'] = str(size)
+                    start_response(response['status'], headers.to_wsgi_list(), response['exc_info'])
+                    yield b''.join(head)
+                    return
+
+            del headers['Content-Length']
+            headers['Content-Encoding'] = encoding
+            etag = headers.get('ETag')
+            if etag and not etag.startswith('W/'):
+                # different bytes than the identity response: no longer a strong match
+                headers['ETag'] = 'W/' + etag
+            start_response(response['status'], headers.to_wsgi_list(), response['exc_info'])
+
+            encoder = self.encoders[encoding]()
+            raw = sent = 0
+            cpu = 0.0
+            try:
+                for data in chain(head, chunks):
+                    if not data:
+                        continue
+                    started = time.thread_time()
+                    out = encoder.compress(data, streamed)
+                    cpu += time.thread_time() - started
+                    raw += len(data)
+                    sent += len(out)
+                    if out:
+                        yield out
+                started = time.thread_time()
+                out = encoder.finish()
+                cpu += time.thread_time() - started
+                sent += len(out)
+                yield out
+            finally:
+                self.record(encoding, raw, sent, cpu)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def record(self, encoding, raw, sent, cpu):
+        if self.metrics is None:
+            return
+        label_values = labels(encoding=encoding)
+        self.metrics.inc('fyyur_compressed_responses_total', label_values)
+        self.metrics.inc('fyyur_compression_input_bytes_total', label_values, raw)
+        self.metrics.inc('fyyur_compression_output_bytes_total', label_values, sent)
+        self.metrics.inc('fyyur_compression_cpu_seconds_total', label_values, cpu)
+
+
+class Compress(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_BYTES', 1400)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        app.config.setdefault('COMPRESS_MIMETYPES', MIMETYPES)
+        if not app.config['COMPRESS_ENABLED']:
+            return
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_bytes=app.config['COMPRESS_MIN_BYTES'],
+            gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+            mimetypes=frozenset(app.config['COMPRESS_MIMETYPES']),
+            metrics=app.extensions.get('metrics'),
+        )
@@ -0,0 +1,29 @@
+#----------------------------------------------------------------------------#
+# Extensions.
+#
+# Created unbound here so blueprints and commands can import them; the
+# application factory in main.py binds them with init_app().
+#----------------------------------------------------------------------------#
+
+from flask_migrate import Migrate
+from flask_moment import Moment
+
+from aio import AsyncDatabase
+from assets import Assets
+from cache import Cache
+from compress import Compress
+from jobs import Jobs
+from metrics import Metrics
+from replicas import Replicas
+from sqltrace import SQLTrace
+
+moment = Moment()
+migrate = Migrate()
+cache = Cache()
+sqltrace = SQLTrace()
+metrics = Metrics()
+replicas = Replicas()
+aio = AsyncDatabase()
+assets = Assets()
+compress = Compress()
+jobs = Jobs()
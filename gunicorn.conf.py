@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Gunicorn production profile.
+#
+#   gunicorn -c gunicorn.conf.py "main:create_app()"
+#
+# GUNICORN_WORKER_CLASS picks the concurrency model:
+#   gthread (default) - WEB_CONCURRENCY processes x GUNICORN_THREADS threads.
+#                       A thread holds at most one connection, so each
+#                       worker's pool is sized to its thread count.
+#   gevent            - WEB_CONCURRENCY processes x GUNICORN_WORKER_CONNECTIONS
+#                       greenlets sharing DB_POOL_SIZE connections (needs
+#                       gevent and psycogreen). Greenlets queue for a
+#                       connection for up to DB_POOL_TIMEOUT seconds.
+#
+# Either way the server holds at most
+#   WEB_CONCURRENCY x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# connections. Set DB_MAX_CONNECTIONS to the share of Postgres'
+# max_connections this server may use (minus headroom for migrations,
+# cron jobs and other hosts) and the per-worker pool is derived from it.
+#----------------------------------------------------------------------------#
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:{}'.format(os.environ.get('PORT', 3000)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+max_requests = 10000
+max_requests_jitter = 1000
+
+# import the app once in the master and fork it, so workers start warm and
+# share the loaded code; post_fork() below drops anything DB-related the
+# master may have opened
+preload_app = True
+
+
+def pool_size():
+    if worker_class == 'gevent':
+        wanted = int(os.environ.get('DB_POOL_SIZE', 10))
+    else:
+        wanted = threads
+    budget = os.environ.get('DB_MAX_CONNECTIONS')
+    if budget:
+        wanted = min(wanted, max(1, int(budget) // workers))
+    return wanted
+
+
+# config.py reads these when the app is preloaded below. Both are set
+# outright: pool_size() has already applied the DB_MAX_CONNECTIONS cap to any
+# DB_POOL_SIZE given, and overflow connections would go past that cap.
+os.environ['DB_POOL_SIZE'] = str(pool_size())
+if os.environ.get('DB_MAX_CONNECTIONS'):
+    os.environ['DB_MAX_OVERFLOW'] = '0'
+else:
+    os.environ.setdefault('DB_MAX_OVERFLOW', '0')
+
+# so config.py defaults the response cache to redis, which the workers
+# share, when there are several
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+
+def post_fork(server, worker):
+    # a forked worker must not reuse connections the master opened: give it
+    # a fresh pool without closing the master's sockets underneath it
+    from extensions import replicas
+    from models import db
+    if worker_class == 'gevent':
+        # make psycopg2 yield to other greenlets while waiting on Postgres
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    app = server.app.wsgi()
+    db.get_engine(app).dispose(close=False)
+    replicas.dispose(app, close=False)
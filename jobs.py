@@ -0,0 +1,172 @@
+#----------------------------------------------------------------------------#
+# Background jobs.
+#
+# Work that can wait until after a write (checking links, ...) is queued as
+# a Job row instead of running in the request. Cache invalidation is not:
+# the writer's redirect must already miss the stale page, and lru tag
+# versions live in the web process, out of a worker's reach. enqueue() adds the row to the
+# request's session, so it commits or rolls back with the write it belongs
+# to: workers see it exactly when that write is visible, and never for one
+# that failed.
+#
+# `flask fyyur worker` runs the jobs on a pool of threads. On PostgreSQL a
+# worker claims a due job with SELECT ... FOR UPDATE SKIP LOCKED, so workers
+# never wait on each other's rows. SQLite (tests, local runs) has no row
+# locks: the claim is an UPDATE conditional on the row being unchanged, which
+# exactly one worker wins. Claiming pushes run_at out by JOBS_LEASE_SECONDS,
+# so the job of a worker that died is picked up again after that; tasks can
+# therefore run more than once and must be safe to repeat.
+#
+# A task that raises is retried after JOBS_RETRY_BASE_SECONDS, doubling up to
+# JOBS_RETRY_MAX_SECONDS, until it has had max_attempts tries; the row then
+# keeps its failed_at and last_error for inspection. Finished jobs are
+# deleted in the same transaction as the task's own writes.
+#----------------------------------------------------------------------------#
+
+import threading
+import traceback
+from datetime import timedelta
+
+from flask import current_app
+
+from models import db, Job, utcnow
+
+# due jobs looked at per claim; on SQLite others may win some of them
+CLAIM_BATCH = 10
+
+
+class Jobs(object):
+
+    def __init__(self, app=None):
+        # task name -> function, filled by @jobs.task (tasks.py)
+        self.tasks = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOBS_MAX_ATTEMPTS', 5)
+        app.config.setdefault('JOBS_LEASE_SECONDS', 300)
+        app.config.setdefault('JOBS_RETRY_BASE_SECONDS', 10)
+        app.config.setdefault('JOBS_RETRY_MAX_SECONDS', 3600)
+        app.config.setdefault('JOBS_POLL_INTERVAL', 1.0)
+        app.config.setdefault('JOBS_HTTP_TIMEOUT', 10)
+        app.extensions['jobs'] = self
+
+    def task(self, name):
+        def register(function):
+            self.tasks[name] = function
+            return function
+        return register
+
+    def enqueue(self, task, delay=None, max_attempts=None, **args):
+        # queues task(**args) with the current transaction; args must be JSON
+        if task not in self.tasks:
+            raise KeyError('no job task named {!r}'.format(task))
+        job = Job(task=task, args=args, attempts=0,
+                  max_attempts=max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+                  run_at=utcnow() + (delay or timedelta(0)))
+        db.session.add(job)
+        return job
+
+    # worker side
+
+    def claim(self):
+        # the next due job, leased to this worker, or None
+        now = utcnow()
+        due = db.session.execute(
+            db.select(Job.id, Job.run_at).where(Job.failed_at.is_(None), Job.run_at <= now)
+            .order_by(Job.run_at, Job.id).limit(CLAIM_BATCH).with_for_update(skip_locked=True)
+        ).all()
+        lease = timedelta(seconds=current_app.config['JOBS_LEASE_SECONDS'])
+        for job_id, run_at in due:
+            claimed = db.session.execute(
+                db.update(Job).where(Job.id == job_id, Job.run_at == run_at, Job.failed_at.is_(None))
+                .values(run_at=now + lease, attempts=Job.attempts + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed:
+                db.session.commit()
+                return db.session.get(Job, job_id)
+        db.session.commit()
+        return None
+
+    def run(self, job):
+        # runs a claimed job; returns 'done', 'retry' or 'failed'
+        job_id, task_name, args = job.id, job.task, dict(job.args)
+        attempts, max_attempts = job.attempts, job.max_attempts
+        task = self.tasks.get(task_name)
+        if task is None:
+            # retrying cannot help
+            error = LookupError('no job task named {!r}'.format(task_name))
+            return self.fail(job_id, task_name, attempts, attempts, error)
+        try:
+            task(**args)
+            # last, so on SQLite the database is not write-locked for the
+            # whole task
+            db.session.execute(db.delete(Job).where(Job.id == job_id).execution_options(synchronize_session=False))
+            db.session.commit()
+            return 'done'
+        except Exception as error:
+            db.session.rollback()
+            return self.fail(job_id, task_name, attempts, max_attempts, error)
+
+    def fail(self, job_id, task_name, attempts, max_attempts, error):
+        message = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+        now = utcnow()
+        if attempts >= max_attempts:
+            current_app.logger.error('job %s (%s) failed for good after %s attempts: %s',
+                                     job_id, task_name, attempts, error)
+            values, outcome = {"failed_at": now, "last_error": message}, 'failed'
+        else:
+            config = current_app.config
+            delay = min(config['JOBS_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), config['JOBS_RETRY_MAX_SECONDS'])
+            current_app.logger.warning('job %s (%s) failed, retrying in %ss: %s', job_id, task_name, delay, error)
+            values, outcome = {"run_at": now + timedelta(seconds=delay), "last_error": message}, 'retry'
+        db.session.execute(db.update(Job).where(Job.id == job_id).values(**values)
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+        return outcome
+
+    def work(self, app, concurrency=1, burst=False, stop=None):
+        # runs jobs on `concurrency` threads until `stop` is set (or, with
+        # burst, until none is due); returns the count of each outcome
+        stop = stop or threading.Event()
+        counts = {"done": 0, "retry": 0, "failed": 0}
+        threads = [threading.Thread(target=self.work_thread, args=(app, stop, burst, counts),
+                                    name='fyyur-worker-{}'.format(number), daemon=True)
+                   for number in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            # short joins, so the main thread still sees signals
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return counts
+
+    def work_thread(self, app, stop, burst, counts):
+        interval = app.config['JOBS_POLL_INTERVAL']
+        while not stop.is_set():
+            job = None
+            with app.app_context():
+                try:
+                    job = self.claim()
+                    if job is not None:
+                        outcome = self.run(job)
+                        with self.lock:
+                            counts[outcome] += 1
+                except Exception:
+                    # the database is unreachable or the like: wait, then retry
+                    app.logger.exception('job worker error')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            if job is None:
+                if burst:
+                    return
+                stop.wait(interval)
@@ -0,0 +1,352 @@
+#----------------------------------------------------------------------------#
+# Metrics.
+#
+# Prometheus text-format metrics at /metrics: request latency histograms per
+# endpoint, in-flight requests, template render time, connection pool
+# gauges, the response cache hit ratio and response compression.
+#
+# Each worker process keeps its numbers in memory behind one lock. With
+# METRICS_DIR set (required with more than one gunicorn worker) every worker
+# also writes a snapshot file there at most every METRICS_FLUSH_INTERVAL
+# seconds; whichever worker serves /metrics adds all snapshots together, so
+# the scrape covers the whole server. A snapshot is named by the worker's pid
+# and a per-process uuid and records the process's start time, so a new
+# worker that reuses a pid never overwrites or impersonates an exited one.
+# When a scrape finds a worker has exited, it adds that worker's counters
+# and histograms to a tombstone file and deletes its snapshot: totals never
+# go backwards, and the exited worker's gauges are dropped.
+#----------------------------------------------------------------------------#
+
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import Response, g, request
+from flask.signals import before_render_template, signals_available, template_rendered
+
+# the summed counters and histograms of exited workers
+TOMBSTONE = 'tombstone.json'
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+  "fyyur_http_requests_total": ('counter', 'Requests handled, by endpoint, method and status.'),
+  "fyyur_http_request_duration_seconds": ('histogram', 'Request handling time, by endpoint and method.'),
+  "fyyur_http_requests_in_flight": ('gauge', 'Requests being handled right now.'),
+  "fyyur_template_render_seconds": ('histogram', 'Template render time, by template.'),
+  "fyyur_db_pool_wait_seconds": ('histogram', 'Time to get a connection from the pool, including opening new ones.'),
+  "fyyur_db_pool_size": ('gauge', 'Configured pool size.'),
+  "fyyur_db_pool_checked_out": ('gauge', 'Connections checked out of the pool.'),
+  "fyyur_db_pool_overflow": ('gauge', 'Connections open beyond the pool size.'),
+  "fyyur_cache_hits_total": ('counter', 'Response cache hits.'),
+  "fyyur_cache_misses_total": ('counter', 'Response cache misses.'),
+  "fyyur_cache_hit_ratio": ('gauge', 'Response cache hits / lookups since start.'),
+  "fyyur_compressed_responses_total": ('counter', 'Responses sent compressed, by encoding.'),
+  "fyyur_compression_input_bytes_total": ('counter', 'Compressed response bytes before compression, by encoding.'),
+  "fyyur_compression_output_bytes_total": ('counter', 'Compressed response bytes as sent, by encoding.'),
+  "fyyur_compression_cpu_seconds_total": ('counter', 'CPU time spent compressing responses, by encoding.'),
+  "fyyur_compression_ratio": ('gauge', 'Bytes sent / bytes before compression since start, by encoding.'),
+}
+
+
+def labels(**values):
+    return ','.join('{}="{}"'.format(key, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                    for key, value in sorted(values.items()))
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def process_started(pid):
+    # the process's start time in clock ticks since boot, or None where
+    # /proc is not available
+    try:
+        with open('/proc/{}/stat'.format(pid)) as stat:
+            # the command name may hold spaces, so count fields from its ')'
+            return int(stat.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def worker_alive(snapshot):
+    # the pid alone could have been reused by a newer process
+    if snapshot['pid'] is None or not pid_alive(snapshot['pid']):
+        return False
+    return snapshot.get('started') is None or snapshot['started'] == process_started(snapshot['pid'])
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as snapshot:
+            return json.load(snapshot)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    with open(path + '.tmp', 'w') as tmp:
+        json.dump(snapshot, tmp)
+    os.replace(path + '.tmp', path)
+
+
+def add_totals(counters, histograms, snapshot):
+    # adds the snapshot's counters and histograms to the given ones
+    for name, series in snapshot['counters'].items():
+        for key, value in series.items():
+            counters.setdefault(name, {})[key] = counters.get(name, {}).get(key, 0) + value
+    for name, series in snapshot['histograms'].items():
+        for key, buckets in series.items():
+            total = histograms.setdefault(name, {}).setdefault(key, [0] * len(buckets))
+            for index, value in enumerate(buckets):
+                total[index] += value
+
+
+class Metrics(object):
+
+    def __init__(self, app=None, db=None, cache=None):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.flushed = 0
+        if app is not None:
+            self.init_app(app, db, cache)
+
+    def init_app(self, app, db=None, cache=None):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 1.0)
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        self.app = app
+        self.db = db
+        self.cache = cache
+        self.directory = app.config['METRICS_DIR']
+        self.interval = app.config['METRICS_FLUSH_INTERVAL']
+        # set per process by worker(): gunicorn forks workers from a master
+        # that already ran this
+        self.pid = None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.teardown_request)
+        if signals_available:
+            before_render_template.connect(self.start_render, app)
+            template_rendered.connect(self.finish_render, app)
+        if db is not None:
+            with app.app_context():
+                self.instrument_engine(db.engine)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+        app.extensions['metrics'] = self
+
+    # recording
+
+    def inc(self, name, label_values, amount=1, gauge=False):
+        with self.lock:
+            series = (self.gauges if gauge else self.counters).setdefault(name, {})
+            series[label_values] = series.get(label_values, 0) + amount
+
+    def set(self, name, label_values, value):
+        with self.lock:
+            self.gauges.setdefault(name, {})[label_values] = value
+
+    def observe(self, name, label_values, seconds):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            buckets = series.get(label_values)
+            if buckets is None:
+                # one count per bucket, then +Inf, sum
+                buckets = series[label_values] = [0] * (len(BUCKETS) + 1) + [0.0]
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            buckets[len(BUCKETS)] += 1
+            buckets[-1] += seconds
+
+    # request lifecycle
+
+    def start_request(self):
+        g.metrics_started = time.perf_counter()
+        self.inc('fyyur_http_requests_in_flight', '', gauge=True)
+
+    def finish_request(self, response):
+        self.record_request(response.status_code)
+        return response
+
+    def teardown_request(self, error):
+        if 'metrics_started' not in g:
+            return
+        if not g.get('metrics_recorded'):
+            self.record_request(500)
+        self.inc('fyyur_http_requests_in_flight', '', -1, gauge=True)
+        if self.directory and time.time() - self.flushed > self.interval:
+            self.flush()
+
+    def record_request(self, status):
+        g.metrics_recorded = True
+        endpoint = request.endpoint or 'unmatched'
+        self.observe('fyyur_http_request_duration_seconds', labels(endpoint=endpoint, method=request.method),
+                     time.perf_counter() - g.metrics_started)
+        self.inc('fyyur_http_requests_total', labels(endpoint=endpoint, method=request.method, status=status))
+
+    def start_render(self, app, template, context, **extra):
+        g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+    def finish_render(self, app, template, context, **extra):
+        started = g.get('metrics_renders')
+        if started:
+            self.observe('fyyur_template_render_seconds', labels(template=template.name),
+                         time.perf_counter() - started.pop())
+
+    def instrument_engine(self, engine):
+        # every Connection gets its DBAPI connection from raw_connection(), so
+        # timing it covers pool waits and new connections; wrapping the
+        # engine (not the pool) survives engine.dispose()
+        raw_connection = engine.raw_connection
+
+        def timed_raw_connection(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return raw_connection(*args, **kwargs)
+            finally:
+                self.observe('fyyur_db_pool_wait_seconds', '', time.perf_counter() - started)
+
+        engine.raw_connection = timed_raw_connection
+        self.engine = engine
+
+    # snapshots
+
+    def sample(self):
+        # point-in-time gauges read at flush/scrape time
+        pool = getattr(getattr(self, 'engine', None), 'pool', None)
+        for name, method in (('fyyur_db_pool_size', 'size'), ('fyyur_db_pool_checked_out', 'checkedout'),
+                             ('fyyur_db_pool_overflow', 'overflow')):
+            if hasattr(pool, method):
+                value = getattr(pool, method)()
+                if method == 'overflow':
+                    # QueuePool counts down from -pool_size while the pool fills
+                    value = max(0, value)
+                self.set(name, '', value)
+        if self.cache is not None:
+            stats = self.cache.stats()
+            with self.lock:
+                self.counters['fyyur_cache_hits_total'] = {'': stats['hits']}
+                self.counters['fyyur_cache_misses_total'] = {'': stats['misses']}
+
+    def worker(self):
+        # this process's snapshot path
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.started = process_started(self.pid)
+            self.path = os.path.join(self.directory or '', '{}-{}.json'.format(self.pid, uuid.uuid4().hex))
+        return self.path
+
+    def snapshot(self):
+        self.worker()
+        self.sample()
+        with self.lock:
+            return {
+              "pid": self.pid,
+              "started": self.started,
+              "counters": {name: dict(series) for name, series in self.counters.items()},
+              "gauges": {name: dict(series) for name, series in self.gauges.items()},
+              "histograms": {name: {key: list(buckets) for key, buckets in series.items()}
+                             for name, series in self.histograms.items()}
+            }
+
+    def flush(self):
+        self.flushed = time.time()
+        write_snapshot(self.worker(), self.snapshot())
+
+    def bury(self):
+        # moves the totals of exited workers into the tombstone and deletes
+        # their snapshots. Under a file lock, so concurrent scrapes never add
+        # a worker twice; the tombstone lists the snapshots it already holds
+        # in case deleting them is cut short.
+        with open(os.path.join(self.directory, 'tombstone.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            tombstone_path = os.path.join(self.directory, TOMBSTONE)
+            tombstone = read_snapshot(tombstone_path) or {
+              "pid": None, "buried": [], "counters": {}, "gauges": {}, "histograms": {}
+            }
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                name = os.path.basename(path)
+                snapshot = None if name == TOMBSTONE else read_snapshot(path)
+                if snapshot is None or worker_alive(snapshot):
+                    continue
+                if name not in tombstone['buried']:
+                    add_totals(tombstone['counters'], tombstone['histograms'], snapshot)
+                dead.append(path)
+            if dead:
+                tombstone['buried'] = [os.path.basename(path) for path in dead]
+                write_snapshot(tombstone_path, tombstone)
+                for path in dead:
+                    os.remove(path)
+
+    def snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        self.bury()
+        found = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            snapshot = read_snapshot(path)
+            if snapshot is not None:
+                found.append(snapshot)
+        return found
+
+    def aggregate(self):
+        counters, gauges, histograms = {}, {}, {}
+        for snapshot in self.snapshots():
+            add_totals(counters, histograms, snapshot)
+            if worker_alive(snapshot):
+                for name, series in snapshot['gauges'].items():
+                    for key, value in series.items():
+                        gauges.setdefault(name, {})[key] = gauges.get(name, {}).get(key, 0) + value
+        hits = counters.get('fyyur_cache_hits_total', {}).get('', 0)
+        misses = counters.get('fyyur_cache_misses_total', {}).get('', 0)
+        if hits + misses:
+            gauges['fyyur_cache_hit_ratio'] = {'': hits / (hits + misses)}
+        sent = counters.get('fyyur_compression_output_bytes_total', {})
+        for key, raw in counters.get('fyyur_compression_input_bytes_total', {}).items():
+            if raw:
+                gauges.setdefault('fyyur_compression_ratio', {})[key] = sent.get(key, 0) / raw
+        return counters, gauges, histograms
+
+    # exposition
+
+    def render(self):
+        counters, gauges, histograms = self.aggregate()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            series = (counters if kind == 'counter' else gauges if kind == 'gauge' else histograms).get(name)
+            if not series:
+                continue
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for key, value in sorted(series.items()):
+                if kind != 'histogram':
+                    lines.append('{}{} {}'.format(name, '{' + key + '}' if key else '', value))
+                    continue
+                for bound, count in zip(BUCKETS + ('+Inf',), value):
+                    bucket_labels = ','.join(filter(None, [key, 'le="{}"'.format(bound)]))
+                    lines.append('{}_bucket{{{}}} {}'.format(name, bucket_labels, count))
+                lines.append('{}_sum{} {}'.format(name, '{' + key + '}' if key else '', value[-1]))
+                lines.append('{}_count{} {}'.format(name, '{' + key + '}' if key else '', value[len(BUCKETS)]))
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,47 @@
+"""search indexes: pg_trgm GIN on postgres, FTS5 tables on sqlite
+
+Revision ID: 032e62d09893
+Revises: b17177be6388
+Create Date: 2022-06-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '032e62d09893'
+down_revision = 'b17177be6388'
+branch_labels = None
+depends_on = None
+
+tables = ('Venue', 'Artist')
+columns = ('name', 'city', 'genres')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in tables:
+            op.execute('CREATE VIRTUAL TABLE "{0}_fts" USING fts5({1})'.format(table, ', '.join(columns)))
+            op.execute('INSERT INTO "{0}_fts" (rowid, {1}) SELECT id, {1} FROM "{0}"'.format(
+                table, ', '.join(columns)))
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in tables:
+        for column in columns:
+            op.create_index(
+                'ix_{}_{}_trgm'.format(table, column), table, [column],
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in tables:
+            op.execute('DROP TABLE "{}_fts"'.format(table))
+        return
+
+    for table in tables:
+        for column in columns:
+            op.drop_index('ix_{}_{}_trgm'.format(table, column), table_name=table)
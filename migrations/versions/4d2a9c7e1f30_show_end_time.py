@@ -0,0 +1,55 @@
+"""Show end_time, and no overlapping shows per venue or artist
+
+Revision ID: 4d2a9c7e1f30
+Revises: e1b4e8aa112d
+Create Date: 2022-07-14 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d2a9c7e1f30'
+down_revision = 'e1b4e8aa112d'
+branch_labels = None
+depends_on = None
+
+# models.SHOW_DEFAULT_DURATION and models.SHOW_MAX_DURATION
+default_hours = 2
+max_hours = 24
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('UPDATE "Show" SET end_time = start_time + interval \'{} hours\''.format(default_hours))
+    else:
+        # keep sqlite's 'YYYY-MM-DD HH:MM:SS.ffffff' storage format
+        op.execute('UPDATE "Show" SET end_time = datetime(start_time, \'+{} hours\') || '
+                   'substr(start_time, 20)'.format(default_hours))
+
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(timezone=True), nullable=False)
+        batch_op.create_check_constraint('ck_Show_end_after_start', 'end_time > start_time')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # a show occupies [start_time, end_time) of its venue and its artist.
+        # Existing double bookings make this fail, naming the pair; fix them
+        # and run the upgrade again.
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in ('venue_id', 'artist_id'):
+            op.execute('ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{0}_time" EXCLUDE USING gist '
+                       '({0} WITH =, tstzrange(start_time, end_time) WITH &&)'.format(column))
+        op.create_check_constraint('ck_Show_max_duration', 'Show',
+                                   "end_time - start_time <= interval '{} hours'".format(max_hours))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('ck_Show_max_duration', 'Show', type_='check')
+        for column in ('venue_id', 'artist_id'):
+            op.drop_constraint('ex_Show_{}_time'.format(column), 'Show')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_constraint('ck_Show_end_after_start', type_='check')
+        batch_op.drop_column('end_time')
@@ -0,0 +1,92 @@
+"""normalize genres into a Genre table with venue/artist association tables
+
+Revision ID: 75f25d907d94
+Revises: 032e62d09893
+Create Date: 2022-06-23 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '75f25d907d94'
+down_revision = '032e62d09893'
+branch_labels = None
+depends_on = None
+
+owners = (('Venue', 'venue_genres', 'venue_id'), ('Artist', 'artist_genres', 'artist_id'))
+
+
+def parse_genres(value):
+    # '{Jazz,"Rock n Roll"}' (a stringified postgres array) -> ['Jazz', 'Rock n Roll']
+    names = (value or '').strip().lstrip('{').rstrip('}').split(',')
+    return [name.strip().strip('"').strip() for name in names if name.strip().strip('"').strip()]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, association, owner_id in owners:
+        op.create_table(association,
+        sa.Column(owner_id, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([owner_id], [table + '.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(owner_id, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(association, owner_id), association, ['genre_id', owner_id])
+
+    # backfill from the old text columns
+    connection = op.get_bind()
+    genre_ids = {}
+    for table, association, owner_id in owners:
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        links = sa.table(association, sa.column(owner_id, sa.Integer), sa.column('genre_id', sa.Integer))
+        rows = []
+        for row_id, genres in connection.execute(sa.select(owner.c.id, owner.c.genres)).fetchall():
+            for name in set(parse_genres(genres)):
+                if name not in genre_ids:
+                    genre_ids[name] = connection.execute(genre.insert().values(name=name)).inserted_primary_key[0]
+                rows.append({owner_id: row_id, 'genre_id': genre_ids[name]})
+        if rows:
+            op.bulk_insert(links, rows)
+
+    for table, association, owner_id in owners:
+        if connection.dialect.name == 'postgresql':
+            op.drop_index('ix_{}_genres_trgm'.format(table), table_name=table)
+        op.drop_column(table, 'genres')
+
+    if connection.dialect.name == 'postgresql':
+        op.create_index('ix_Genre_name_trgm', 'Genre', ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    connection = op.get_bind()
+    if connection.dialect.name == 'postgresql':
+        op.drop_index('ix_Genre_name_trgm', table_name='Genre')
+
+    genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    for table, association, owner_id in owners:
+        op.add_column(table, sa.Column('genres', sa.String(length=120), nullable=True))
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        links = sa.table(association, sa.column(owner_id, sa.Integer), sa.column('genre_id', sa.Integer))
+        names = {}
+        for row_id, name in connection.execute(
+            sa.select(links.c[owner_id], genre.c.name).join(genre, genre.c.id == links.c.genre_id).order_by(genre.c.name)
+        ).fetchall():
+            names.setdefault(row_id, []).append(name)
+        for row_id, row_names in names.items():
+            connection.execute(owner.update().where(owner.c.id == row_id).values(genres='{' + ','.join(row_names) + '}'))
+        if connection.dialect.name == 'postgresql':
+            op.create_index('ix_{}_genres_trgm'.format(table), table, ['genres'],
+                            postgresql_using='gin', postgresql_ops={'genres': 'gin_trgm_ops'})
+        op.drop_index('ix_{}_genre_id_{}'.format(association, owner_id), table_name=association)
+        op.drop_table(association)
+
+    op.drop_table('Genre')
@@ -0,0 +1,40 @@
+"""Job table for the background job queue
+
+Revision ID: 8b3f6d2a0c51
+Revises: 4d2a9c7e1f30
+Create Date: 2022-07-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3f6d2a0c51'
+down_revision = '4d2a9c7e1f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'Job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task', sa.String(length=120), nullable=False),
+        sa.Column('args', sa.JSON(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('failed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # only pending jobs are ever claimed, so failed ones stay out of the index
+    op.create_index('ix_Job_run_at_pending', 'Job', ['run_at'],
+                    postgresql_where=sa.text('failed_at IS NULL'), sqlite_where=sa.text('failed_at IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_Job_run_at_pending', table_name='Job')
+    op.drop_table('Job')
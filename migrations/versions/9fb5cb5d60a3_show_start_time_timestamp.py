@@ -0,0 +1,83 @@
+"""store Show.start_time as a timestamp and index it per venue and artist
+
+Revision ID: 9fb5cb5d60a3
+Revises: 7c32a257bd8b
+Create Date: 2022-06-02 10:00:00.000000
+
+"""
+from datetime import timezone
+
+from alembic import op
+import dateutil.parser
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9fb5cb5d60a3'
+down_revision = '7c32a257bd8b'
+branch_labels = None
+depends_on = None
+
+show = sa.table('Show', sa.column('id', sa.Integer), sa.column('start_time', sa.String))
+
+
+# SQLAlchemy's DateTime stores sqlite values in exactly this form, and
+# compares them as text
+SQLITE_DATETIME = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9].' + '[0-9]' * 6
+
+
+def normalize(value):
+    # rewrites whatever the form stored as a naive UTC 'YYYY-MM-DD HH:MM:SS'
+    # string that the postgres cast accepts.
+    try:
+        date = dateutil.parser.parse(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        # one statement into SQLAlchemy's 'YYYY-MM-DD HH:MM:SS.ffffff':
+        # strftime() reads ISO 8601 with or without a UTC offset (and turns
+        # it into UTC) but keeps only milliseconds. Anything else, as on
+        # postgres, becomes NULL; the GLOB stops sqlite from reading 'now'.
+        connection.execute(sa.text(
+            "UPDATE \"Show\" SET start_time = CASE WHEN start_time GLOB '[0-9][0-9][0-9][0-9]-*' THEN "
+            "strftime('%Y-%m-%d %H:%M:%S', start_time) || '.' || substr(strftime('%f', start_time), 4) || '000' "
+            "END WHERE start_time IS NOT NULL AND start_time NOT GLOB :stored"
+        ), {"stored": SQLITE_DATETIME})
+    else:
+        for show_id, start_time in connection.execute(sa.select(show.c.id, show.c.start_time)).fetchall():
+            normalized = normalize(start_time)
+            if normalized != start_time:
+                connection.execute(
+                    show.update().where(show.c.id == show_id).values(start_time=normalized)
+                )
+
+    # sqlite keeps datetimes as text anyway, and a batch copy would CAST the
+    # strings to numbers, so only the postgres column changes type.
+    if connection.dialect.name != 'sqlite':
+        op.alter_column(
+            'Show', 'start_time',
+            existing_type=sa.String(),
+            type_=sa.DateTime(timezone=True),
+            postgresql_using="start_time::timestamp AT TIME ZONE 'UTC'"
+        )
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'])
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'])
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column(
+            'Show', 'start_time',
+            existing_type=sa.DateTime(timezone=True),
+            type_=sa.String(),
+            postgresql_using="to_char(start_time AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+        )
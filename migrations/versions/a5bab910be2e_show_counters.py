@@ -0,0 +1,43 @@
+"""stored upcoming/past show counters on Venue and Artist
+
+Revision ID: a5bab910be2e
+Revises: 75f25d907d94
+Create Date: 2022-06-30 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5bab910be2e'
+down_revision = '75f25d907d94'
+branch_labels = None
+depends_on = None
+
+owners = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    show = sa.table('Show', sa.column('id', sa.Integer), sa.column('start_time', sa.DateTime),
+                    sa.column('venue_id', sa.Integer), sa.column('artist_id', sa.Integer))
+    for table, owner_id in owners:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('upcoming_shows_count', sa.Integer),
+                         sa.column('past_shows_count', sa.Integer))
+
+        def counted(when):
+            return sa.select(sa.func.count(show.c.id)).where(show.c[owner_id] == owner.c.id, when).scalar_subquery()
+
+        op.execute(owner.update().values(
+            upcoming_shows_count=counted(show.c.start_time > sa.func.current_timestamp()),
+            past_shows_count=counted(show.c.start_time <= sa.func.current_timestamp())
+        ))
+
+
+def downgrade():
+    for table, owner_id in owners:
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,24 @@
+"""index Artist on lower(name) for the alphabetical artist index
+
+Revision ID: b17177be6388
+Revises: 9fb5cb5d60a3
+Create Date: 2022-06-09 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b17177be6388'
+down_revision = '9fb5cb5d60a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Artist_lower_name', 'Artist', [sa.text('lower(name)'), 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_Artist_lower_name', table_name='Artist')
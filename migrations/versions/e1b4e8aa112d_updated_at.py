@@ -0,0 +1,35 @@
+"""updated_at on Venue, Artist and Show for conditional GET
+
+Revision ID: e1b4e8aa112d
+Revises: a5bab910be2e
+Create Date: 2022-07-07 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b4e8aa112d'
+down_revision = 'a5bab910be2e'
+branch_labels = None
+depends_on = None
+
+tables = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    for table in tables:
+        # sqlite cannot add a column with a CURRENT_TIMESTAMP default, so
+        # backfill existing rows separately; new rows get it from the ORM.
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+        op.execute(sa.table(table, sa.column('updated_at', sa.DateTime)).update().values(
+            updated_at=sa.func.current_timestamp()
+        ))
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'])
+
+
+def downgrade():
+    for table in tables:
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,214 @@
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta, timezone
+
+import dateutil.parser
+from sqlalchemy import event, inspect
+
+import search
+from replicas import RoutingSQLAlchemy
+
+# reads can be routed to replicas, see replicas.py
+db = RoutingSQLAlchemy()
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def parse_start_time(value):
+    # show times are stored in UTC; naive form input is taken to already be UTC.
+    date = dateutil.parser.parse(value) if isinstance(value, str) else value
+    if date.tzinfo is None:
+        return date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc)
+
+
+# how long a show runs when no end time is given, and the longest it may
+# run; the cap keeps overlap checks to a bounded index range (schedule.py)
+SHOW_DEFAULT_DURATION = timedelta(hours=2)
+SHOW_MAX_DURATION = timedelta(hours=24)
+
+
+def default_end_time(context):
+    start_time = context.get_current_parameters().get('start_time')
+    return None if start_time is None else parse_start_time(start_time) + SHOW_DEFAULT_DURATION
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String())
+    facebook_link = db.Column(db.String())
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    website_link = db.Column(db.String(500))
+    seeking_talent = db.Column(db.Boolean, default=False)
+    seeking_description = db.Column(db.String)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow, index=True)
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', lazy=True)
+    shows = db.relationship('Show', backref='Venue', lazy=True)
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', lazy=True)
+    image_link = db.Column(db.String())
+    facebook_link = db.Column(db.String(120))
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    website_link = db.Column(db.String(500))
+    seeking_venue = db.Column(db.Boolean, default=False)
+    seeking_description = db.Column(db.String)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow, index=True)
+    shows = db.relationship('Show', backref='Artist', lazy=True)
+
+
+# backs the alphabetical keyset navigation on /artists
+db.Index('ix_Artist_lower_name', db.func.lower(Artist.name), Artist.id)
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.CheckConstraint('end_time > start_time', name='ck_Show_end_after_start'),
+        # PostgreSQL also has the ex_Show_venue_id_time/ex_Show_artist_id_time
+        # exclusion constraints and ck_Show_max_duration, see the migration
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    start_time = db.Column(db.DateTime(timezone=True))
+    end_time = db.Column(db.DateTime(timezone=True), nullable=False, default=default_end_time)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow, index=True)
+
+
+class Job(db.Model):
+    # post-write work waiting for `flask fyyur worker`, see jobs.py. Pending
+    # while failed_at is NULL; run_at is when it is next due (or, while a
+    # worker holds it, when that worker's lease runs out).
+    __tablename__ = 'Job'
+    __table_args__ = (
+        db.Index('ix_Job_run_at_pending', 'run_at',
+                 postgresql_where=db.text('failed_at IS NULL'), sqlite_where=db.text('failed_at IS NULL')),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(120), nullable=False)
+    args = db.Column(db.JSON, nullable=False, default=dict)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+    last_error = db.Column(db.Text)
+    failed_at = db.Column(db.DateTime(timezone=True))
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+
+
+def refresh_show_counts(session, venue_ids=(), artist_ids=(), now=None):
+    # recomputes the stored upcoming/past counters of the given venues and
+    # artists from the Show table (each count is a range scan on the
+    # (venue_id|artist_id, start_time) indexes).
+    if now is None:
+        now = datetime.now(timezone.utc)
+
+    for model, column, ids in ((Venue, Show.venue_id, venue_ids), (Artist, Show.artist_id, artist_ids)):
+        ids = sorted(set(ids) - {None})
+        if not ids:
+            continue
+
+        def counted(when):
+            return db.select(db.func.count(Show.id)).where(column == model.id, when).scalar_subquery()
+
+        session.execute(model.__table__.update().where(model.id.in_(ids)).values(
+            upcoming_shows_count=counted(Show.start_time > now),
+            past_shows_count=counted(Show.start_time <= now)
+        ))
+
+
+@event.listens_for(db.session, 'after_flush')
+def maintain_show_counts(session, flush_context):
+    # keeps Venue/Artist show counters in step with Show writes: inserts and
+    # deletes adjust the counters in place, edits to a show recount the
+    # venues and artists it moved between.
+    now = datetime.now(timezone.utc)
+    deltas = {}
+    recount_venues = set()
+    recount_artists = set()
+
+    def bump(show, delta):
+        if show.start_time is None:
+            return
+        counter = 'upcoming_shows_count' if parse_start_time(show.start_time) > now else 'past_shows_count'
+        for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+            if owner_id is not None:
+                deltas[model, owner_id, counter] = deltas.get((model, owner_id, counter), 0) + delta
+
+    for show in session.new:
+        if isinstance(show, Show):
+            bump(show, 1)
+    for show in session.deleted:
+        if isinstance(show, Show):
+            bump(show, -1)
+    for show in session.dirty:
+        if isinstance(show, Show) and session.is_modified(show):
+            for attribute, ids in (('venue_id', recount_venues), ('artist_id', recount_artists)):
+                ids.update(inspect(show).attrs[attribute].history.sum())
+
+    for (model, owner_id, counter), delta in deltas.items():
+        if delta:
+            table = model.__table__
+            session.execute(table.update().where(table.c.id == owner_id).values(
+                {counter: table.c[counter] + delta}
+            ))
+    refresh_show_counts(session, recount_venues, recount_artists, now)
+
+
+search.register(Venue, ('name', 'city'), genres='genres')
+search.register(Artist, ('name', 'city'), genres='genres')
+# on db.session like maintain_show_counts, not on Session: once the app's
+# session class has after_flush listeners of its own, ones added to Session
+# before that class was made never fire for it
+event.listen(db.session, 'after_flush', search.sync_fts)
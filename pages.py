@@ -0,0 +1,82 @@
+#----------------------------------------------------------------------------#
+# Pages.
+#
+# The home page, the search-as-you-type API, template filters and error pages.
+#----------------------------------------------------------------------------#
+
+from functools import lru_cache
+
+import dateutil.parser
+import babel
+from flask import Blueprint, render_template, request, abort, url_for, jsonify, current_app
+
+import search
+from extensions import replicas
+from models import db, Venue, Artist
+
+bp = Blueprint('pages', __name__)
+
+
+@bp.app_template_filter('datetime')
+@lru_cache(maxsize=4096)
+def format_datetime(value, format='medium'):
+    # memoized: show lists format the same few thousand times over and over,
+    # and parsing plus babel formatting dominates their render time
+    if isinstance(value, str):
+        date = dateutil.parser.parse(value)
+    else:
+        date = value
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Search API
+#  ----------------------------------------------------------------
+
+@bp.route('/api/search')
+@replicas.read_only
+def api_search():
+    # top name-prefix matches as JSON for the search-as-you-type box.
+    models = {
+      "venue": (Venue, 'venues.show_venue', 'venue_id'),
+      "artist": (Artist, 'artists.show_artist', 'artist_id'),
+    }
+    if request.args.get('type') not in models:
+        abort(400)
+    model, endpoint, id_arg = models[request.args['type']]
+    term = request.args.get('q', '')
+
+    ids = search.prefix_ids(db.session, model, term, current_app.config['SEARCH_AUTOCOMPLETE_LIMIT'])
+    names = dict(model.query.with_entities(model.id, model.name).filter(model.id.in_(ids)).all()) if ids else {}
+
+    response = jsonify({
+      "type": request.args['type'],
+      "q": term,
+      "results": [{
+        "id": result_id,
+        "name": names[result_id],
+        "url": url_for(endpoint, **{id_arg: result_id})
+      } for result_id in ids if result_id in names]
+    })
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['SEARCH_AUTOCOMPLETE_MAX_AGE']
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
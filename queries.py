@@ -0,0 +1,344 @@
+#----------------------------------------------------------------------------#
+# Queries.
+#
+# Read-side helpers shared by the blueprints: page builders, search, cache
+# tags and the validators behind conditional GET.
+#----------------------------------------------------------------------------#
+
+import base64
+import json
+from datetime import datetime, timezone
+from itertools import groupby
+
+from flask import abort, current_app, request
+from sqlalchemy.orm import joinedload, selectinload
+
+import search
+from extensions import aio
+from models import db, Genre, Venue, Artist, Show, venue_genres
+
+
+def encode_cursor(*values):
+    # opaque ?after= token holding the sort key of the last row on a page.
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        abort(400)
+
+
+def page_size(default, maximum):
+    # ?limit= clamped to the configured cap.
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def genres_named(names):
+    # Genre rows for the submitted names, creating any that are new.
+    names = sorted(set(name.strip() for name in names if name.strip()))
+    if not names:
+        return []
+    genres = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+    return [genres.get(name) or Genre(name=name) for name in names]
+
+
+def venue_rows(genre=None):
+    # the (id, name, city, state, upcoming count) rows of /venues ordered by
+    # area, fetched lazily in batches (a server-side cursor on PostgreSQL).
+    # The statement runs now, on whichever database the view reads from.
+    # `genre` narrows it to venues tagged with that genre name.
+    rows = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count
+    )
+    if genre is not None:
+        rows = rows.join(venue_genres, venue_genres.c.venue_id == Venue.id).join(
+            Genre, db.and_(Genre.id == venue_genres.c.genre_id, Genre.name == genre)
+        )
+    return iter(rows.order_by(Venue.city, Venue.state, Venue.id).yield_per(current_app.config['STREAM_FETCH_ROWS']))
+
+
+def venue_areas(rows):
+    # builds the city/state -> venues -> upcoming show count tree for /venues
+    # from venue_rows(), lazily: each area's venues are read from `rows` as
+    # the template reaches them, so a streamed page holds one batch at a time.
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        yield {
+          "city": city,
+          "state": state,
+          "venues": ({
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.upcoming_shows_count
+          } for row in venues)
+        }
+
+
+def show_page(limit, after=None, when=None, start=None, end=None, now=None):
+    # one keyset page of /shows, ordered on (start_time, id) and projected to
+    # the columns pages/shows.html renders. Returns the rows and the cursor of
+    # the next page, or None on the last page.
+    if now is None:
+        now = datetime.now(timezone.utc)
+
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        # fragment cache keys (cache.py)
+        Show.updated_at,
+        Artist.updated_at.label('artist_updated_at'),
+        Venue.updated_at.label('venue_updated_at')
+    ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id)
+
+    if when == 'upcoming':
+        query = query.filter(Show.start_time > now)
+    elif when == 'past':
+        query = query.filter(Show.start_time <= now)
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+
+    key = db.tuple_(Show.start_time, Show.id)
+    if when == 'past':
+        # most recent first
+        if after is not None:
+            query = query.filter(key < db.tuple_(*after))
+        query = query.order_by(Show.start_time.desc(), Show.id.desc())
+    else:
+        if after is not None:
+            query = query.filter(key > db.tuple_(*after))
+        query = query.order_by(Show.start_time, Show.id)
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].start_time, rows[-1].id)
+
+
+def artist_page(limit, after=None, before=None, letter=None):
+    # one page of the alphabetical artist index, projected to id and name and
+    # ordered on (lower(name), id). Returns the rows plus the cursors of the
+    # previous and next pages (None when there is no such page).
+    sort_name = db.func.lower(Artist.name)
+    key = db.tuple_(sort_name, Artist.id)
+    query = Artist.query.with_entities(Artist.id, Artist.name, sort_name.label('sort_name'))
+
+    if before is not None:
+        rows = query.filter(key < db.tuple_(*before)).order_by(
+            sort_name.desc(), Artist.id.desc()
+        ).limit(limit + 1).all()
+        has_prev = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            query = query.filter(key > db.tuple_(*after))
+        elif letter is not None:
+            query = query.filter(sort_name >= letter.lower())
+        rows = query.order_by(sort_name, Artist.id).limit(limit + 1).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = after is not None or letter is not None
+
+    prev_cursor = encode_cursor(rows[0].sort_name, rows[0].id) if rows and has_prev else None
+    next_cursor = encode_cursor(rows[-1].sort_name, rows[-1].id) if rows and has_next else None
+    return rows, prev_cursor, next_cursor
+
+
+def search_results(model, term):
+    # ranked matches for the search pages with their upcoming show counts.
+    ids = search.search_ids(db.session, model, term, current_app.config['SEARCH_RESULTS_LIMIT'])
+    rows = model.query.with_entities(
+        model.id, model.name, model.upcoming_shows_count
+    ).filter(model.id.in_(ids)).all() if ids else []
+    found = {row.id: row for row in rows}
+
+    data = [{
+      "id": result_id,
+      "name": found[result_id].name,
+      "num_upcoming_shows": found[result_id].upcoming_shows_count,
+    } for result_id in ids if result_id in found]
+
+    return {
+      "count": len(data),
+      "data": data
+    }
+
+
+def venue_cache_tags(venue_id):
+    # cached pages that render this venue: its own page, the listings and
+    # the pages of every artist booked there.
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    return ['venues', 'shows', 'venue:{}'.format(venue_id)] + [
+        'artist:{}'.format(row.artist_id) for row in artist_ids]
+
+
+def artist_cache_tags(artist_id):
+    # cached pages that render this artist: its own page, the listings and
+    # the pages of every venue it is booked at.
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    return ['artists', 'shows', 'artist:{}'.format(artist_id)] + [
+        'venue:{}'.format(row.venue_id) for row in venue_ids]
+
+
+#  Validators for conditional GET: one statement each, returning the newest
+#  updated_at the page depends on and a token that changes with the page.
+#  Show writes and roll-forward touch the venue/artist counters, which moves
+#  their updated_at, so timestamps alone also cover added and past shows.
+
+def newest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def venue_version(venue_id):
+    row = db.session.query(
+        Venue.updated_at, db.func.max(Show.updated_at), db.func.max(Artist.updated_at)
+    ).outerjoin(Show, Show.venue_id == Venue.id).outerjoin(Artist, Artist.id == Show.artist_id).filter(
+        Venue.id == venue_id
+    ).group_by(Venue.id, Venue.updated_at).first()
+    if row is None:
+        return None
+    return newest(*row), tuple(row)
+
+
+def artist_version(artist_id):
+    row = db.session.query(
+        Artist.updated_at, db.func.max(Show.updated_at), db.func.max(Venue.updated_at)
+    ).outerjoin(Show, Show.artist_id == Artist.id).outerjoin(Venue, Venue.id == Show.venue_id).filter(
+        Artist.id == artist_id
+    ).group_by(Artist.id, Artist.updated_at).first()
+    if row is None:
+        return None
+    return newest(*row), tuple(row)
+
+
+def table_version(*models):
+    # newest updated_at across whole tables (index-only via ix_*_updated_at)
+    # plus their row counts, which catch deletes.
+    row = db.session.query(*[
+        db.select(aggregate).scalar_subquery()
+        for model in models
+        for aggregate in (db.func.max(model.updated_at), db.func.count(model.id))
+    ]).one()
+    return newest(*row[::2]), tuple(row)
+
+
+def show_timeline(criterion, counterpart, now, upcoming):
+    # one index range scan on (venue_id|artist_id, start_time) for either side
+    # of `now`, with the counterpart artist or venue joined in.
+    if upcoming:
+        when, order = Show.start_time > now, Show.start_time.asc()
+    else:
+        when, order = Show.start_time <= now, Show.start_time.desc()
+
+    return db.select(Show).options(joinedload(counterpart)).where(criterion, when).order_by(order)
+
+
+def fetch_all(*statements):
+    # the three statements of a detail page are independent, so in ASGI mode
+    # they run concurrently; otherwise one after the other on db.session
+    if aio.enabled():
+        return aio.gather(*statements)
+    return [db.session.execute(statement).scalars().all() for statement in statements]
+
+
+def venue_detail(venue_id):
+    # loads the venue with its genres, and its upcoming and past shows with
+    # their artists.
+    now = datetime.now(timezone.utc)
+    venues, upcoming, past = fetch_all(
+        db.select(Venue).options(selectinload(Venue.genres)).where(Venue.id == venue_id),
+        show_timeline(Show.venue_id == venue_id, Show.Artist, now, True),
+        show_timeline(Show.venue_id == venue_id, Show.Artist, now, False)
+    )
+    if not venues:
+        abort(404)
+    my_venue = venues[0]
+
+    def describe(show):
+        return {
+          "id": show.id,
+          "artist_id": show.artist_id,
+          "artist_name": show.Artist.name,
+          "artist_image_link": show.Artist.image_link,
+          "start_time": show.start_time,
+          "updated_at": newest(show.updated_at, show.Artist.updated_at)
+        }
+
+    upcoming_shows = [describe(show) for show in upcoming]
+    past_shows = [describe(show) for show in past]
+
+    return {
+      "id": my_venue.id,
+      "name": my_venue.name,
+      "genres": [genre.name for genre in my_venue.genres],
+      "address": my_venue.address,
+      "city": my_venue.city,
+      "state": my_venue.state,
+      "phone": my_venue.phone,
+      "website": my_venue.website_link,
+      "facebook_link": my_venue.facebook_link,
+      "seeking_talent": my_venue.seeking_talent,
+      "seeking_description": my_venue.seeking_description,
+      "image_link": my_venue.image_link,
+      "past_shows": past_shows,
+      "upcoming_shows": upcoming_shows,
+      "past_shows_count": len(past_shows),
+      "upcoming_shows_count": len(upcoming_shows),
+    }
+
+
+def artist_detail(artist_id):
+    # loads the artist with its genres, and its upcoming and past shows with
+    # their venues.
+    now = datetime.now(timezone.utc)
+    artists, upcoming, past = fetch_all(
+        db.select(Artist).options(selectinload(Artist.genres)).where(Artist.id == artist_id),
+        show_timeline(Show.artist_id == artist_id, Show.Venue, now, True),
+        show_timeline(Show.artist_id == artist_id, Show.Venue, now, False)
+    )
+    if not artists:
+        abort(404)
+    my_artist = artists[0]
+
+    def describe(show):
+        return {
+          "id": show.id,
+          "venue_id": show.venue_id,
+          "venue_name": show.Venue.name,
+          "venue_image_link": show.Venue.image_link,
+          "start_time": show.start_time,
+          "updated_at": newest(show.updated_at, show.Venue.updated_at)
+        }
+
+    upcoming_shows = [describe(show) for show in upcoming]
+    past_shows = [describe(show) for show in past]
+
+    return {
+      "id": my_artist.id,
+      "name": my_artist.name,
+      "genres": [genre.name for genre in my_artist.genres],
+      "city": my_artist.city,
+      "state": my_artist.state,
+      "phone": my_artist.phone,
+      "website": my_artist.website_link,
+      "facebook_link": my_artist.facebook_link,
+      "seeking_venue": my_artist.seeking_venue,
+      "seeking_description": my_artist.seeking_description,
+      "image_link": my_artist.image_link,
+      "past_shows": past_shows,
+      "upcoming_shows": upcoming_shows,
+      "past_shows_count": len(past_shows),
+      "upcoming_shows_count": len(upcoming_shows),
+    }
@@ -0,0 +1,154 @@
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+# Views decorated with @replicas.read_only run their queries on one of the
+# REPLICA_URIS engines; everything else, and every flush, uses the primary.
+#
+# Read-your-writes: a request that commits sets a short-lived cookie, and
+# for REPLICA_STICKY_SECONDS that client's reads stay on the primary.
+#
+# Lag guard: each replica's replay lag is measured at most every
+# REPLICA_LAG_CHECK_INTERVAL seconds (per worker); replicas more than
+# REPLICA_MAX_LAG_SECONDS behind, or failing the check, get no reads until
+# they catch up, and with none healthy reads fall back to the primary.
+# Other clients may still see data up to REPLICA_MAX_LAG_SECONDS old, and
+# the response cache may keep such a page until its next invalidation.
+#----------------------------------------------------------------------------#
+
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import create_engine, event, orm, text
+
+COOKIE = 'fyyur_primary_until'
+
+# seconds the replica is behind: 0 when it has replayed everything it has
+# received, else the age of the last replayed transaction
+PG_LAG = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = g.get('db_replica') if has_app_context() else None
+        if replica is not None and not self._flushing:
+            return replica
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def mark_dirty(session, flush_context):
+    if has_app_context():
+        g.db_dirty = True
+
+
+def mark_write(session):
+    # ignore commits that only ended a read transaction
+    if has_app_context() and g.get('db_dirty'):
+        g.db_wrote = True
+
+
+class Replica(object):
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lag = 0.0
+        self.checked = 0.0
+        self.healthy = True
+
+
+class Replicas(object):
+
+    def __init__(self, app=None, db=None):
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 10)
+        app.config.setdefault('REPLICA_LAG_CHECK_INTERVAL', 1.0)
+        app.extensions['replicas'] = {"replicas": None}
+        app.after_request(self.remember_write)
+        if not event.contains(db.session, 'after_commit', mark_write):
+            event.listen(db.session, 'after_flush', mark_dirty)
+            event.listen(db.session, 'after_commit', mark_write)
+
+    def replicas(self, app):
+        state = app.extensions['replicas']
+        if state['replicas'] is None:
+            with self.lock:
+                if state['replicas'] is None:
+                    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+                    state['replicas'] = [Replica(create_engine(uri, **options)) for uri in app.config['REPLICA_URIS']]
+        return state['replicas']
+
+    def dispose(self, app, close=True):
+        # for forked workers, like Engine.dispose(close=False) on the primary
+        for replica in app.extensions['replicas']['replicas'] or []:
+            replica.engine.dispose(close=close)
+
+    def check(self, replica, now):
+        was_healthy = replica.healthy
+        replica.checked = now
+        try:
+            with replica.engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    replica.lag = float(connection.execute(PG_LAG).scalar() or 0)
+                else:
+                    connection.execute(text('SELECT 1'))
+                    replica.lag = 0.0
+            replica.healthy = replica.lag <= current_app.config['REPLICA_MAX_LAG_SECONDS']
+        except Exception as error:
+            replica.healthy = False
+            if was_healthy:
+                current_app.logger.warning('replica %s failed its lag check: %s', replica.engine.url, error)
+            return
+        if was_healthy and not replica.healthy:
+            current_app.logger.warning('replica %s is %.1fs behind, not reading from it', replica.engine.url, replica.lag)
+        elif replica.healthy and not was_healthy:
+            current_app.logger.info('replica %s caught up', replica.engine.url)
+
+    def choose(self):
+        # a healthy replica engine for this request, or None for the primary
+        sticky_until = request.cookies.get(COOKIE, type=float)
+        if sticky_until is not None and sticky_until > time.time():
+            return None
+        replicas = self.replicas(current_app._get_current_object())
+        now = time.time()
+        interval = current_app.config['REPLICA_LAG_CHECK_INTERVAL']
+        for replica in replicas:
+            if now - replica.checked >= interval:
+                self.check(replica, now)
+        healthy = [replica for replica in replicas if replica.healthy]
+        return random.choice(healthy).engine if healthy else None
+
+    def read_only(self, view):
+        # routes the view's queries to a replica; put it right under the route
+        @wraps(view)
+        def wrapper(**kwargs):
+            g.db_replica = self.choose()
+            try:
+                return view(**kwargs)
+            finally:
+                g.db_replica = None
+        return wrapper
+
+    def remember_write(self, response):
+        if g.get('db_wrote'):
+            window = current_app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(COOKIE, str(time.time() + window), max_age=window, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,96 @@
+#----------------------------------------------------------------------------#
+# Scheduling conflicts.
+#
+# A show occupies its venue and its artist over [start_time, end_time). On
+# PostgreSQL two exclusion constraints refuse overlapping shows outright;
+# the checks here give the form a readable answer before it submits, and
+# stand in for the constraints on SQLite and in bulk imports.
+#
+# No show runs longer than SHOW_MAX_DURATION, so any show overlapping
+# [start, end) starts in (start - SHOW_MAX_DURATION, end): conflicts() is a
+# bounded range scan on the (venue_id|artist_id, start_time) indexes, and
+# Schedule checks a batch in memory with a binary search per lookup.
+#----------------------------------------------------------------------------#
+
+from bisect import bisect_right, insort
+
+from sqlalchemy.orm import joinedload
+
+from models import db, Show, SHOW_DEFAULT_DURATION, SHOW_MAX_DURATION, parse_start_time
+
+
+# SQLSTATE of a write refused by the PostgreSQL exclusion constraints
+EXCLUSION_VIOLATION = '23P01'
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+def show_times(start_time, end_time=None, duration=None):
+    # (start, end) in UTC from a start and an end or a duration (default
+    # SHOW_DEFAULT_DURATION). Raises ScheduleError for impossible times, and
+    # ValueError/OverflowError for unparseable ones.
+    start_time = parse_start_time(start_time)
+    if end_time is not None:
+        end_time = parse_start_time(end_time)
+    else:
+        end_time = start_time + (duration if duration is not None else SHOW_DEFAULT_DURATION)
+    if end_time <= start_time:
+        raise ScheduleError('the show must end after it starts')
+    if end_time - start_time > SHOW_MAX_DURATION:
+        raise ScheduleError('a show can run for at most {} hours'.format(int(SHOW_MAX_DURATION.total_seconds() // 3600)))
+    return start_time, end_time
+
+
+def overlapping(start_time, end_time):
+    return db.and_(Show.start_time > start_time - SHOW_MAX_DURATION, Show.start_time < end_time,
+                   Show.end_time > start_time)
+
+
+def conflicts(venue_id, artist_id, start_time, end_time):
+    # stored shows that would overlap a show of this venue or artist
+    return Show.query.options(joinedload(Show.Venue), joinedload(Show.Artist)).filter(
+        db.or_(Show.venue_id == venue_id, Show.artist_id == artist_id), overlapping(start_time, end_time)
+    ).order_by(Show.start_time).all()
+
+
+class Schedule(object):
+    # booked time slots per venue and per artist: a list sorted by start for
+    # each, so lookups bisect to the first slot that could overlap
+
+    def __init__(self):
+        self.slots = {}
+
+    def load(self, session, start_time, end_time, venue_ids=None, artist_ids=None):
+        # adds the stored shows overlapping [start_time, end_time), of the
+        # given venues or artists (None: all of them)
+        query = session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time).filter(
+            overlapping(start_time, end_time))
+        if venue_ids is not None or artist_ids is not None:
+            query = query.filter(db.or_(Show.venue_id.in_(sorted(venue_ids or ())),
+                                        Show.artist_id.in_(sorted(artist_ids or ()))))
+        for row in query:
+            self.book(row.venue_id, row.artist_id, parse_start_time(row.start_time), parse_start_time(row.end_time))
+
+    def busy(self, key, start_time, end_time):
+        slots = self.slots.get(key, ())
+        index = bisect_right(slots, (start_time - SHOW_MAX_DURATION,))
+        while index < len(slots) and slots[index][0] < end_time:
+            if slots[index][1] > start_time:
+                return slots[index]
+            index += 1
+        return None
+
+    def conflict(self, venue_id, artist_id, start_time, end_time):
+        # a message naming the first clash, or None if the show fits
+        for kind, owner_id in (('venue', venue_id), ('artist', artist_id)):
+            slot = self.busy((kind, owner_id), start_time, end_time)
+            if slot is not None:
+                return '{} {} is booked from {:%Y-%m-%d %H:%M} to {:%Y-%m-%d %H:%M}'.format(
+                    kind, owner_id, slot[0], slot[1])
+        return None
+
+    def book(self, venue_id, artist_id, start_time, end_time):
+        for key in (('venue', venue_id), ('artist', artist_id)):
+            insort(self.slots.setdefault(key, []), (start_time, end_time))
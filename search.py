@@ -0,0 +1,172 @@
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Ranked name/city/genre search for venues and artists. On PostgreSQL the
+# columns (and genre names) carry pg_trgm GIN indexes, so `ILIKE '%term%'`
+# and similarity ranking are index scans. Elsewhere (SQLite in tests and local runs) each
+# model gets an FTS5 shadow table `<table>_fts` keyed on the row id, which
+# is kept in step with the ORM on every flush.
+#----------------------------------------------------------------------------#
+
+import re
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.orm import Session, selectinload
+
+# model -> searchable column names, and model -> name of its to-many genre
+# relationship (or None); both filled in by register()
+fields = {}
+genre_relations = {}
+
+
+def register(model, columns, genres=None):
+    fields[model] = tuple(columns)
+    genre_relations[model] = genres
+
+
+def fts_columns(model):
+    return fields[model] + (('genres',) if genre_relations[model] else ())
+
+
+def dialect_name(session, model):
+    return session.connection(bind_arguments={'mapper': model.__mapper__}).dialect.name
+
+
+def fts_table(model):
+    return '{}_fts'.format(model.__tablename__)
+
+
+def fts_query(term):
+    # every word must match as a prefix, quoted so FTS operators in user
+    # input are taken literally.
+    words = re.findall(r'\w+', term)
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+
+def document(instance):
+    model = type(instance)
+    doc = {column: getattr(instance, column) or '' for column in fields[model]}
+    if genre_relations[model]:
+        doc['genres'] = ' '.join(genre.name for genre in getattr(instance, genre_relations[model]))
+    return doc
+
+
+def search_ids(session, model, term, limit):
+    # ids of the best `limit` matches for `term`, best first.
+    term = term.strip()
+    if not term:
+        return []
+
+    if dialect_name(session, model) == 'postgresql':
+        columns = [getattr(model, column) for column in fields[model]]
+        pattern = '%{}%'.format(term)
+        matches = [column.ilike(pattern) for column in columns] + [columns[0].op('%')(term)]
+        if genre_relations[model]:
+            relation = getattr(model, genre_relations[model])
+            matches.append(relation.any(relation.property.mapper.class_.name.ilike(pattern)))
+        score = func.greatest(*[func.similarity(func.coalesce(column, ''), term) for column in columns])
+        rows = session.query(model.id).filter(or_(*matches)).order_by(score.desc(), model.id).limit(limit)
+        return [row.id for row in rows]
+
+    query = fts_query(term)
+    if not query:
+        return []
+    rows = session.execute(
+        text('SELECT rowid FROM "{0}" WHERE "{0}" MATCH :query ORDER BY rank LIMIT :limit'.format(fts_table(model))),
+        {'query': query, 'limit': limit}
+    )
+    return [row[0] for row in rows]
+
+
+def prefix_ids(session, model, term, limit):
+    # ids of up to `limit` rows whose name starts with a word prefix of
+    # `term`, for search-as-you-type.
+    term = term.strip()
+    if not term:
+        return []
+
+    if dialect_name(session, model) == 'postgresql':
+        name = getattr(model, fields[model][0])
+        rows = session.query(model.id).filter(
+            name.ilike('{}%'.format(term.replace('%', r'\%').replace('_', r'\_')))
+        ).order_by(func.lower(name), model.id).limit(limit)
+        return [row.id for row in rows]
+
+    query = fts_query(term)
+    if not query:
+        return []
+    rows = session.execute(
+        text('SELECT rowid FROM "{0}" WHERE "{0}" MATCH :query ORDER BY rank LIMIT :limit'.format(fts_table(model))),
+        {'query': '{} : ({})'.format(fields[model][0], query), 'limit': limit}
+    )
+    return [row[0] for row in rows]
+
+
+def trgm_indexes(model):
+    # (index name, table, column) of every trigram index search_ids() relies on
+    indexes = [('ix_{}_{}_trgm'.format(model.__tablename__, column), model.__tablename__, column)
+               for column in fields[model]]
+    if genre_relations[model]:
+        table = getattr(model, genre_relations[model]).property.mapper.class_.__tablename__
+        indexes.append(('ix_{}_name_trgm'.format(table), table, 'name'))
+    return indexes
+
+
+def create_index(engine, *models):
+    # for databases built with create_all() rather than the migrations.
+    with engine.begin() as connection:
+        for model in models:
+            if engine.dialect.name == 'postgresql':
+                connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+                for name, table, column in trgm_indexes(model):
+                    connection.execute(text(
+                        'CREATE INDEX IF NOT EXISTS "{}" ON "{}" USING gin ({} gin_trgm_ops)'.format(name, table, column)
+                    ))
+            elif engine.dialect.name == 'sqlite' and not engine.dialect.has_table(connection, fts_table(model)):
+                connection.execute(text('CREATE VIRTUAL TABLE "{}" USING fts5({})'.format(
+                    fts_table(model), ', '.join(fts_columns(model)))))
+                reindex(Session(bind=connection), model)
+
+
+def reindex(session, model, batch_size=1000):
+    # rebuilds the FTS5 table for `model` from scratch; a no-op on postgres,
+    # whose GIN indexes are maintained by the database.
+    if dialect_name(session, model) != 'sqlite':
+        return
+    columns = fts_columns(model)
+    insert = text('INSERT INTO "{0}" (rowid, {1}) VALUES (:id, {2})'.format(
+        fts_table(model), ', '.join(columns), ', '.join(':' + column for column in columns)))
+
+    session.execute(text('DELETE FROM "{}"'.format(fts_table(model))))
+    query = session.query(model).order_by(model.id)
+    if genre_relations[model]:
+        query = query.options(selectinload(getattr(model, genre_relations[model])))
+    batch = []
+    for instance in query.yield_per(batch_size):
+        batch.append(dict(document(instance), id=instance.id))
+        if len(batch) == batch_size:
+            session.execute(insert, batch)
+            batch = []
+    if batch:
+        session.execute(insert, batch)
+
+
+def sync_fts(session, flush_context):
+    # mirrors inserts, updates and deletes of registered models into their
+    # FTS5 tables inside the same transaction; an after_flush listener that
+    # models.py attaches to db.session.
+    changed = [instance for instance in session.new | session.dirty if type(instance) in fields]
+    deleted = [instance for instance in session.deleted if type(instance) in fields]
+    if not changed and not deleted:
+        return
+    if dialect_name(session, type((changed or deleted)[0])) != 'sqlite':
+        return
+
+    for instance in changed + deleted:
+        session.execute(text('DELETE FROM "{}" WHERE rowid = :id'.format(fts_table(type(instance)))),
+                        {'id': instance.id})
+    for instance in changed:
+        columns = fts_columns(type(instance))
+        session.execute(text('INSERT INTO "{0}" (rowid, {1}) VALUES (:id, {2})'.format(
+            fts_table(type(instance)), ', '.join(columns), ', '.join(':' + column for column in columns)
+        )), dict(document(instance), id=instance.id))
@@ -0,0 +1,86 @@
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#
+# Reproducible venue, artist and show rows for `flask fyyur seed` and the
+# benchmarks in bench.py. The same seed always yields the same rows, so two
+# databases seeded alike give comparable benchmark runs.
+#----------------------------------------------------------------------------#
+
+from datetime import timedelta
+
+from forms import VenueForm
+from models import SHOW_DEFAULT_DURATION
+
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+CITIES = ['San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle', 'Nashville', 'Denver',
+          'Portland', 'Boston', 'Atlanta', 'New Orleans', 'Detroit', 'Miami', 'Memphis', 'Oakland']
+
+# shows fall within this many days either side of now; a show that clashes
+# with one already generated is re-drawn up to MAX_ATTEMPTS times
+SHOW_DAYS = 365
+MAX_ATTEMPTS = 100
+
+ADJECTIVES = ['Blue', 'Golden', 'Electric', 'Velvet', 'Silver', 'Wild', 'Midnight', 'Crimson', 'Hollow',
+              'Lucky', 'Neon', 'Quiet', 'Broken', 'Little', 'Grand', 'Rusty', 'Paper', 'Copper']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Theater', 'Club', 'Garage', 'Ballroom', 'Cellar', 'Loft']
+ARTIST_NOUNS = ['Owls', 'Harbor', 'Echoes', 'Foxes', 'Parade', 'Tides', 'Lanterns', 'Ghosts', 'Wolves',
+                'Arcade', 'Machines', 'Rivers', 'Saints', 'Comets']
+
+
+def location(rng):
+    return rng.choice(CITIES), rng.choice(STATES)
+
+
+def genre_list(rng):
+    return rng.sample(GENRES, rng.randint(1, 3))
+
+
+def venue_rows(rng, count, start=1):
+    for number in range(start, start + count):
+        city, state = location(rng)
+        yield {
+          "name": 'The {} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(VENUE_NOUNS), number),
+          "city": city,
+          "state": state,
+          "address": '{} {} St'.format(rng.randint(1, 9999), rng.choice(ADJECTIVES)),
+          "phone": '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+          "genres": genre_list(rng),
+          "website_link": 'https://venue{}.example.com'.format(number),
+          "seeking_talent": rng.random() < 0.3,
+          "seeking_description": 'Looking for local acts.' if rng.random() < 0.3 else None,
+        }
+
+
+def artist_rows(rng, count, start=1):
+    for number in range(start, start + count):
+        city, state = location(rng)
+        yield {
+          "name": '{} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(ARTIST_NOUNS), number),
+          "city": city,
+          "state": state,
+          "phone": '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+          "genres": genre_list(rng),
+          "website_link": 'https://artist{}.example.com'.format(number),
+          "seeking_venue": rng.random() < 0.3,
+        }
+
+
+def show_rows(rng, count, venue_ids, artist_ids, now, booked, days=SHOW_DAYS):
+    # shows spread evenly over `days` either side of `now`, on the hour, each
+    # clear of the shows in `booked` (a schedule.Schedule), which it extends
+    for _ in range(count):
+        for attempt in range(MAX_ATTEMPTS):
+            start_time = (now + timedelta(hours=rng.randint(-days * 24, days * 24))).replace(minute=0, second=0, microsecond=0)
+            show = {
+              "start_time": start_time,
+              "end_time": start_time + SHOW_DEFAULT_DURATION,
+              "venue_id": rng.choice(venue_ids),
+              "artist_id": rng.choice(artist_ids),
+            }
+            if booked.conflict(**show) is None:
+                break
+        else:
+            raise ValueError('no free slot for another show after {} attempts; seed fewer shows'.format(MAX_ATTEMPTS))
+        booked.book(**show)
+        yield show
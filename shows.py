@@ -0,0 +1,142 @@
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+from datetime import timedelta
+
+from flask import Blueprint, render_template, request, flash, abort, current_app, jsonify
+from sqlalchemy.exc import IntegrityError
+
+import schedule
+from extensions import cache, replicas
+from cache import conditional
+from forms import ShowForm
+from models import db, Venue, Artist, Show, parse_start_time
+from queries import decode_cursor, page_size, show_page, table_version
+
+bp = Blueprint('shows', __name__)
+
+
+@bp.route('/shows')
+@replicas.read_only
+@conditional(lambda: table_version(Show, Venue, Artist))
+@cache.cached('shows')
+def shows():
+    # displays list of shows at /shows, a page at a time
+    when = request.args.get('when')
+    if when not in (None, 'upcoming', 'past'):
+        abort(400)
+    try:
+        start = parse_start_time(request.args['from']) if request.args.get('from') else None
+        end = parse_start_time(request.args['to']) if request.args.get('to') else None
+        after = None
+        if request.args.get('after'):
+            start_time, show_id = decode_cursor(request.args['after'])
+            if not isinstance(start_time, str):
+                raise TypeError('cursor start_time must be a string')
+            after = (parse_start_time(start_time), int(show_id))
+    except (TypeError, ValueError, OverflowError):
+        abort(400)
+
+    limit = page_size(current_app.config['SHOWS_PAGE_SIZE'], current_app.config['SHOWS_PAGE_SIZE_MAX'])
+    data, next_cursor = show_page(limit, after=after, when=when, start=start, end=end)
+
+    filters = {
+      "when": when,
+      "from": request.args.get('from'),
+      "to": request.args.get('to'),
+      "limit": request.args.get('limit', type=int)
+    }
+    return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, filters=filters)
+
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+def requested_show(values):
+    # (venue_id, artist_id, start_time, end_time) from form or query values;
+    # ValueError/OverflowError (schedule.ScheduleError for impossible times)
+    duration = values.get('duration', type=int)
+    start_time, end_time = schedule.show_times(
+        values['start_time'], duration=timedelta(minutes=duration) if duration is not None else None
+    )
+    return int(values['venue_id']), int(values['artist_id']), start_time, end_time
+
+
+def describe_conflict(show, venue_id):
+    return {
+      "show_id": show.id,
+      "clash": 'venue' if show.venue_id == venue_id else 'artist',
+      "venue_id": show.venue_id,
+      "venue_name": show.Venue.name,
+      "artist_id": show.artist_id,
+      "artist_name": show.Artist.name,
+      "start_time": parse_start_time(show.start_time).isoformat(),
+      "end_time": parse_start_time(show.end_time).isoformat()
+    }
+
+
+@bp.route('/shows/conflicts')
+def show_conflicts():
+    # the stored shows a proposed show would overlap, for the scheduling
+    # form; read from the primary so a just-booked show is never missed
+    try:
+        venue_id, artist_id, start_time, end_time = requested_show(request.args)
+    except schedule.ScheduleError as error:
+        return jsonify({"error": str(error), "conflicts": []}), 400
+    except (KeyError, TypeError, ValueError, OverflowError):
+        abort(400)
+    found = schedule.conflicts(venue_id, artist_id, start_time, end_time)
+    response = jsonify({"conflicts": [describe_conflict(show, venue_id) for show in found]})
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form.
+    # Overlapping shows are turned away here; on PostgreSQL the exclusion
+    # constraints also catch two submissions racing for the same slot.
+    try:
+        venue_id, artist_id, start_time, end_time = requested_show(request.form)
+    except schedule.ScheduleError as error:
+        flash('Show could not be listed: {}.'.format(error))
+        return render_template('forms/new_show.html', form=ShowForm(request.form)), 400
+    except (KeyError, TypeError, ValueError, OverflowError):
+        flash('An error occurred. Show could not be listed.')
+        return render_template('forms/new_show.html', form=ShowForm(request.form)), 400
+
+    found = schedule.conflicts(venue_id, artist_id, start_time, end_time)
+    if found:
+        clash = describe_conflict(found[0], venue_id)
+        flash('Show could not be listed: {} is already booked from {} to {}.'.format(
+            clash['venue_name'] if clash['clash'] == 'venue' else clash['artist_name'],
+            clash['start_time'], clash['end_time']))
+        return render_template('forms/new_show.html', form=ShowForm(request.form)), 409
+
+    try:
+        add_show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time)
+
+        db.session.add(add_show)
+        db.session.commit()
+        cache.invalidate('shows', 'venues', 'venue:{}'.format(add_show.venue_id),
+                         'artist:{}'.format(add_show.artist_id))
+        flash('Show was successfully listed!')
+
+    except IntegrityError as error:
+        db.session.rollback()
+        if getattr(error.orig, 'pgcode', None) == schedule.EXCLUSION_VIOLATION:
+            flash('Show could not be listed: the venue or artist was just booked for that time.')
+        else:
+            flash('An error occurred. Show could not be listed.')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Show could not be listed.')
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
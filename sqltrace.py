@@ -0,0 +1,119 @@
+#----------------------------------------------------------------------------#
+# SQL tracing.
+#
+# Counts the statements each request issues and the time spent in them, and
+# reports both in a Server-Timing header (visible in the browser's network
+# panel). Statements are grouped by shape - whitespace and IN-lists
+# collapsed - and a shape that runs more than SQLTRACE_N_PLUS_ONE_THRESHOLD
+# times in one request is an N+1: it is logged as a warning, or raised as
+# NPlusOneError when SQLTRACE_RAISE is set (the default under TESTING).
+#
+# A streamed response (streaming.py) runs most of its queries while the body
+# is sent, after its headers are gone: its Server-Timing covers only the
+# statements before the body, and the N+1 check waits until the response is
+# closed, so it sees the body's statements too.
+#----------------------------------------------------------------------------#
+
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class NPlusOneError(RuntimeError):
+    pass
+
+
+def fingerprint(statement):
+    # the shape of a statement: bound values are already placeholders, so
+    # only IN-list lengths and formatting vary between repeats
+    statement = re.sub(r'\s+', ' ', statement).strip()
+    return re.sub(r'\(\s*(?:\?|%\([^)]*\)s|%s)(?:\s*,\s*(?:\?|%\([^)]*\)s|%s))*\s*\)', '(...)', statement)
+
+
+class RequestTrace(object):
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.statements += 1
+        self.seconds += seconds
+        self.shapes[fingerprint(statement)] += 1
+
+
+def current():
+    # the trace of the request being handled, or None outside one
+    if has_request_context():
+        return g.get('sqltrace')
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current() is not None:
+        conn.info.setdefault('sqltrace_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current()
+    started = conn.info.get('sqltrace_started')
+    if trace is not None and started:
+        trace.record(statement, time.perf_counter() - started.pop())
+
+
+class SQLTrace(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLTRACE_ENABLED', True)
+        app.config.setdefault('SQLTRACE_N_PLUS_ONE_THRESHOLD', 5)
+        app.config.setdefault('SQLTRACE_RAISE', None)
+        self.app = app
+        if app.config['SQLTRACE_ENABLED']:
+            app.before_request(self.start)
+            app.after_request(self.finish)
+        app.extensions['sqltrace'] = self
+
+    def start(self):
+        g.sqltrace = RequestTrace()
+
+    def finish(self, response):
+        trace = g.get('sqltrace')
+        if trace is None:
+            return response
+
+        total = time.perf_counter() - trace.started
+        response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} queries"'.format(trace.seconds * 1000, trace.statements))
+        response.headers.add('Server-Timing', 'app;dur={:.2f}'.format(total * 1000))
+
+        endpoint = request.endpoint or request.path
+        if response.is_streamed:
+            # the trace stays in g and keeps counting while the body runs
+            response.call_on_close(lambda: self.check(trace, endpoint))
+        else:
+            g.pop('sqltrace')
+            self.check(trace, endpoint)
+        return response
+
+    def check(self, trace, endpoint):
+        threshold = self.app.config['SQLTRACE_N_PLUS_ONE_THRESHOLD']
+        raise_errors = self.app.config['SQLTRACE_RAISE']
+        if raise_errors is None:
+            raise_errors = self.app.testing
+        repeated = [(shape, count) for shape, count in trace.shapes.most_common() if count > threshold]
+        for shape, count in repeated:
+            message = 'N+1 in {}: statement ran {} times: {}'.format(endpoint, count, shape[:300])
+            if raise_errors:
+                raise NPlusOneError(message)
+            self.app.logger.warning(message)
@@ -2,3 +2,129 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Search-as-you-type for the navbar search boxes: waits for a pause in
+// typing, cancels the previous request and lists the top name matches.
+(function () {
+  var DEBOUNCE_MS = 200;
+
+  function attach(form) {
+    var input = form.querySelector('input[name="search_term"]');
+    var type = form.getAttribute('action').indexOf('/artists') === 0 ? 'artist' : 'venue';
+    var list = document.createElement('ul');
+    var timer = null;
+    var inflight = null;
+
+    list.className = 'search-suggestions';
+    form.appendChild(list);
+
+    function render(results) {
+      list.innerHTML = '';
+      results.forEach(function (result) {
+        var item = document.createElement('li');
+        var link = document.createElement('a');
+        link.href = result.url;
+        link.textContent = result.name;
+        item.appendChild(link);
+        list.appendChild(item);
+      });
+    }
+
+    function lookup(q) {
+      if (inflight) {
+        inflight.abort();
+      }
+      if (!q) {
+        inflight = null;
+        render([]);
+        return;
+      }
+      inflight = new AbortController();
+      fetch('/api/search?type=' + type + '&q=' + encodeURIComponent(q), { signal: inflight.signal })
+        .then(function (response) { return response.json(); })
+        .then(function (body) { render(body.results); })
+        .catch(function (error) {
+          if (error.name !== 'AbortError') {
+            render([]);
+          }
+        });
+    }
+
+    input.setAttribute('autocomplete', 'off');
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () { lookup(input.value.trim()); }, DEBOUNCE_MS);
+    });
+    input.addEventListener('blur', function () {
+      setTimeout(function () { render([]); }, DEBOUNCE_MS);
+    });
+  }
+
+  if (!window.fetch || !window.AbortController) {
+    return;
+  }
+  document.querySelectorAll('form.search').forEach(attach);
+})();
+
+// Scheduling form: as the venue, artist, start time or duration change,
+// lists the shows the new one would overlap (GET /shows/conflicts).
+(function () {
+  var DEBOUNCE_MS = 300;
+
+  function attach(form) {
+    var list = form.querySelector('.schedule-conflicts');
+    var timer = null;
+    var inflight = null;
+
+    function render(items) {
+      list.innerHTML = '';
+      items.forEach(function (text) {
+        var item = document.createElement('li');
+        item.textContent = text;
+        list.appendChild(item);
+      });
+    }
+
+    function check() {
+      var params = new URLSearchParams();
+      ['venue_id', 'artist_id', 'start_time', 'duration'].forEach(function (name) {
+        params.set(name, form.elements[name].value.trim());
+      });
+      if (!params.get('venue_id') || !params.get('artist_id') || !params.get('start_time')) {
+        render([]);
+        return;
+      }
+      if (inflight) {
+        inflight.abort();
+      }
+      inflight = new AbortController();
+      fetch(form.getAttribute('data-conflicts') + '?' + params.toString(), { signal: inflight.signal })
+        .then(function (response) { return response.json(); })
+        .then(function (body) {
+          if (body.error) {
+            render([body.error]);
+            return;
+          }
+          render(body.conflicts.map(function (show) {
+            return (show.clash === 'venue' ? show.venue_name : show.artist_name) +
+              ' is already booked from ' + show.start_time + ' to ' + show.end_time;
+          }));
+        })
+        .catch(function (error) {
+          if (error.name !== 'AbortError') {
+            render([]);
+          }
+        });
+    }
+
+    form.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(check, DEBOUNCE_MS);
+    });
+  }
+
+  if (!window.fetch || !window.AbortController) {
+    return;
+  }
+  document.querySelectorAll('form.schedule').forEach(attach);
+})();
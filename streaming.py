@@ -0,0 +1,62 @@
+#----------------------------------------------------------------------------#
+# Streaming responses.
+#
+# stream_template() renders a template while the response is being sent:
+# the page goes out in STREAM_BUFFER_BYTES chunks as Jinja produces it, so
+# a listing of any length costs the worker one chunk of HTML plus the rows
+# in flight instead of the whole page. Pair it with a lazily fetched
+# iterator (Query.yield_per, a server-side cursor on PostgreSQL) passed
+# through Stream.rows(), which also flushes everything rendered before the
+# first row - the layout head, navigation and CSS links - right away.
+#
+# Streamed responses skip the response cache (it stores whole bodies) and
+# are sent with chunked encoding.
+#----------------------------------------------------------------------------#
+
+from flask import Response, current_app, stream_with_context
+from flask.signals import before_render_template, template_rendered
+
+
+class Stream(object):
+
+    def __init__(self, buffer_bytes):
+        self.buffer_bytes = buffer_bytes
+        self.flush_requested = False
+
+    def rows(self, iterable):
+        # hands `iterable` to the template, asking for a flush when the
+        # template starts on it
+        self.flush_requested = True
+        yield from iterable
+
+    def chunks(self, pieces):
+        buffer, size = [], 0
+        for piece in pieces:
+            buffer.append(piece)
+            size += len(piece)
+            if size >= self.buffer_bytes or self.flush_requested:
+                self.flush_requested = False
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer)
+
+
+def stream_template(template_name, stream=None, **context):
+    # render_template() as a streamed Response; `stream` is the Stream whose
+    # rows() the context's iterators went through
+    app = current_app._get_current_object()
+    if stream is None:
+        stream = Stream(app.config['STREAM_BUFFER_BYTES'])
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+
+    def generate():
+        before_render_template.send(app, template=template, context=context)
+        yield from stream.chunks(template.generate(context))
+        template_rendered.send(app, template=template, context=context)
+
+    response = Response(stream_with_context(generate()), mimetype='text/html')
+    # let nginx and similar proxies pass chunks on as they arrive
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
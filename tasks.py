@@ -0,0 +1,131 @@
+#----------------------------------------------------------------------------#
+# Job tasks.
+#
+# The functions `flask fyyur worker` runs (see jobs.py), registered under
+# the names the write handlers enqueue them by. A job may run more than
+# once, so each must be safe to repeat; raising means "retry later".
+#----------------------------------------------------------------------------#
+
+import http.client
+import ipaddress
+import urllib.error
+import urllib.request
+
+from flask import current_app
+
+from extensions import jobs
+from models import db, Venue, Artist
+
+OWNERS = {
+  "Venue": Venue,
+  "Artist": Artist,
+}
+
+
+class UnsafeLink(ValueError):
+    # a link leading somewhere a server-side fetch must not go
+    pass
+
+
+def check_address(address):
+    # refuses an IP the server could reach but the public could not:
+    # loopback, private (RFC 1918, ULA), link-local (cloud metadata at
+    # 169.254.169.254), shared, reserved, multicast and unspecified ones
+    ip = ipaddress.ip_address(address)
+    if getattr(ip, 'ipv4_mapped', None) is not None:
+        ip = ip.ipv4_mapped
+    if not ip.is_global or ip.is_multicast:
+        raise UnsafeLink('{} is not a public address'.format(address))
+
+
+class PublicConnection(object):
+    # checks the address actually connected to, so every A/AAAA record,
+    # each redirect hop and a DNS answer changed since any earlier lookup
+    # are all covered
+    def connect(self):
+        super().connect()
+        try:
+            check_address(self.sock.getpeername()[0])
+        except UnsafeLink:
+            self.close()
+            raise
+
+
+class PublicHTTPConnection(PublicConnection, http.client.HTTPConnection):
+    pass
+
+
+class PublicHTTPSConnection(PublicConnection, http.client.HTTPSConnection):
+    pass
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+class PublicRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # urllib would also follow a redirect to ftp://
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not newurl.lower().startswith(('http://', 'https://')):
+            raise UnsafeLink('redirect to {!r} is not an http(s) URL'.format(newurl))
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def link_opener():
+    # http(s) only, and no proxies from the environment: a proxy would make
+    # the connection, and the check, on our behalf
+    opener = urllib.request.OpenerDirector()
+    for handler in (urllib.request.ProxyHandler({}), PublicHTTPHandler(), PublicHTTPSHandler(),
+                    PublicRedirectHandler(), urllib.request.HTTPDefaultErrorHandler(),
+                    urllib.request.HTTPErrorProcessor()):
+        opener.add_handler(handler)
+    return opener
+
+
+def link_status(url, method):
+    # (status, content type) of a request for url; network errors and
+    # responses worth retrying (429, 5xx) raise, and so does UnsafeLink
+    request = urllib.request.Request(url, method=method, headers={"User-Agent": 'fyyur-link-check'})
+    try:
+        with link_opener().open(request, timeout=current_app.config['JOBS_HTTP_TIMEOUT']) as response:
+            return response.status, response.headers.get('Content-Type', '')
+    except urllib.error.HTTPError as error:
+        if error.code == 429 or error.code >= 500:
+            raise
+        return error.code, error.headers.get('Content-Type', '')
+
+
+@jobs.task('check-image-link')
+def check_image_link(model, id, url):
+    # logs an image_link that does not lead to an image
+    owner = db.session.get(OWNERS[model], id)
+    if owner is None or owner.image_link != url:
+        # deleted, or edited since; the edit queued a check of its own
+        return
+    if not url.lower().startswith(('http://', 'https://')):
+        current_app.logger.warning('%s %s: image_link %r is not an http(s) URL', model, id, url)
+        return
+    try:
+        status, content_type = link_status(url, 'HEAD')
+        if status == 405:
+            # some servers only answer GET; the body is never read
+            status, content_type = link_status(url, 'GET')
+    except UnsafeLink as error:
+        # not retried: the link will not become safe
+        current_app.logger.warning('%s %s: image_link %s was not checked: %s', model, id, url, error)
+        return
+    if status >= 400 or not content_type.startswith('image/'):
+        current_app.logger.warning('%s %s: image_link %s looks broken (%s, %s)',
+                                   model, id, url, status, content_type or 'no content type')
+
+
+def queue_image_check(owner):
+    # for a flushed Venue/Artist, so it has its id; empty links are left alone
+    if owner.image_link:
+        jobs.enqueue('check-image-link', model=type(owner).__name__, id=owner.id, url=owner.image_link)
@@ -0,0 +1,93 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#
+# Every test gets a fresh SQLite database built by the migrations, so the
+# schema under test is the one `flask db upgrade` deploys (FTS tables
+# included). Run from the repository root: python -m pytest
+#----------------------------------------------------------------------------#
+
+import os
+
+import pytest
+from flask_migrate import upgrade
+from sqlalchemy import event
+
+from main import create_app
+from models import db, Venue, Artist
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # error.log and other relative paths land in the test's directory
+    monkeypatch.chdir(tmp_path)
+    app = create_app(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite:///{}'.format(tmp_path / 'test.db'),
+        WTF_CSRF_ENABLED=False,
+        TEMPLATE_CACHE_DIR=None,
+        ASSETS_DIR=str(tmp_path / 'dist'),
+    )
+    with app.app_context():
+        upgrade(directory=os.path.join(basedir, 'migrations'))
+        db.session.remove()
+    # alembic's logging config disables the loggers that already exist
+    app.logger.disabled = False
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.get_engine().dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    # seed(shows, venues=None, artists=None) fills the database like
+    # `flask fyyur seed`
+    def seed(shows, **counts):
+        args = ['fyyur', 'seed', '--shows', str(shows)]
+        for name, count in counts.items():
+            args += ['--' + name, str(count)]
+        result = app.test_cli_runner().invoke(args=args)
+        assert result.exit_code == 0, result.output
+    return seed
+
+
+@pytest.fixture
+def statements(app):
+    # statements() is the number of SQL statements run so far
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.get_engine()
+    event.listen(engine, 'before_cursor_execute', count)
+    yield lambda: len(executed)
+    event.remove(engine, 'before_cursor_execute', count)
+
+
+@pytest.fixture
+def create(app, client):
+    # create('venue' or 'artist', name, **fields) submits the create form and
+    # returns the new row's id
+    forms = {
+      "venue": (Venue, {"city": 'San Francisco', "state": 'CA', "address": '1015 Folsom Street',
+                        "phone": '123-123-1234', "genres": ['Jazz'], "website_link": '', "image_link": '',
+                        "facebook_link": '', "seeking_description": ''}),
+      "artist": (Artist, {"city": 'San Francisco', "state": 'CA', "phone": '326-123-5000', "genres": ['Rock n Roll'],
+                          "website_link": '', "image_link": '', "facebook_link": '', "seeking_description": ''}),
+    }
+
+    def create(kind, name, **fields):
+        model, form = forms[kind]
+        assert client.post('/{}s/create'.format(kind), data=dict(form, name=name, **fields)).status_code == 200
+        with app.app_context():
+            return model.query.filter_by(name=name).one().id
+    return create
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from aio import LOOP_KEY
+from asgi import ASGIAdapter
+from extensions import aio
+from models import Venue, Show
+
+
+def get(adapter, path):
+    # one GET through the adapter on a fresh event loop; returns the status,
+    # headers and body it sent
+    scope = {"type": 'http', "method": 'GET', "path": path, "query_string": b'', "headers": [],
+             "http_version": '1.1', "scheme": 'http', "server": ('testserver', 80), "client": ('127.0.0.1', 1234)}
+    requests = [{"type": 'http.request', "body": b'', "more_body": False}]
+    sent = []
+
+    async def receive():
+        return requests.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await adapter(scope, receive, send)
+        await aio.dispose(adapter.wsgi_app)
+
+    asyncio.run(run())
+    start = sent[0]
+    assert start['type'] == 'http.response.start'
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], dict(start['headers']), body.decode('utf-8')
+
+
+@pytest.fixture
+def venue_with_shows(app, create, client):
+    venue_id = create('venue', 'The Musical Hop')
+    artist_id = create('artist', 'Guns N Petals')
+    for start_time in ('2035-05-21 21:30:00', '2015-05-21 21:30:00'):
+        client.post('/shows/create', data={"venue_id": venue_id, "artist_id": artist_id, "start_time": start_time})
+    return venue_id
+
+
+def test_venue_page_through_the_adapter(app, venue_with_shows):
+    app.config['ASYNC_QUERIES'] = False
+    status, headers, body = get(ASGIAdapter(app, threads=2), '/venues/{}'.format(venue_with_shows))
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/html')
+    assert 'The Musical Hop' in body and 'Guns N Petals' in body
+
+
+def test_venue_page_gathers_its_queries(app, venue_with_shows):
+    pytest.importorskip('aiosqlite')
+    status, headers, body = get(ASGIAdapter(app, threads=2), '/venues/{}'.format(venue_with_shows))
+    assert status == 200
+    assert 'The Musical Hop' in body and '1 Upcoming Show' in body and '1 Past Show' in body
+
+
+def test_gather_returns_each_statement_in_order(app, venue_with_shows):
+    pytest.importorskip('aiosqlite')
+    loop = asyncio.new_event_loop()
+    # the server's loop, running beside the request's thread
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        with app.test_request_context(environ_base={LOOP_KEY: loop}):
+            assert aio.enabled()
+            venues, shows = aio.gather(select(Venue), select(Show).order_by(Show.start_time))
+            assert [venue.name for venue in venues] == ['The Musical Hop']
+            assert [show.start_time.year for show in shows] == [2015, 2035]
+        asyncio.run_coroutine_threadsafe(aio.dispose(app), loop).result()
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
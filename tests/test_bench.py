@@ -0,0 +1,20 @@
+from bench import regressions
+
+
+def result(p95_ms=10.0, queries=2, peak_kb=200):
+    return {"p50_ms": p95_ms, "p95_ms": p95_ms, "p99_ms": p95_ms, "queries": queries, "peak_kb": peak_kb}
+
+
+def test_memory_growth_within_tolerance_is_not_a_regression():
+    assert regressions({"venues": result(peak_kb=240)}, {"venues": result()}, 0.25, 2.0) == []
+
+
+def test_memory_growth_beyond_tolerance_is_a_regression():
+    found = regressions({"venues": result(peak_kb=400)}, {"venues": result()}, 0.25, 2.0)
+    assert found == ['venues: peak 400 KiB, baseline 200 KiB']
+
+
+def test_baseline_without_peak_memory_still_compares():
+    before = result()
+    del before['peak_kb']
+    assert regressions({"venues": result(peak_kb=4000)}, {"venues": before}, 0.25, 2.0) == []
@@ -0,0 +1,46 @@
+import pytest
+
+from main import create_app
+from models import db, Venue
+
+
+def test_venue_page_is_cached_and_revalidated(client, create):
+    venue_id = create('venue', 'The Musical Hop')
+    url = '/venues/{}'.format(venue_id)
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['X-Cache'] == 'MISS'
+    etag = first.headers['ETag']
+
+    second = client.get(url)
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers['ETag'] == etag
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+
+
+def test_cached_body_matches_its_etag(app, client, create):
+    venue_id = create('venue', 'The Musical Hop')
+    url = '/venues/{}'.format(venue_id)
+    etag = client.get(url).headers['ETag']
+
+    # written by another worker: its cache invalidation never reaches this
+    # worker's in-process cache, but the validator sees the new updated_at
+    with app.app_context():
+        db.session.get(Venue, venue_id).name = 'The Dueling Pianos Bar'
+        db.session.commit()
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.headers['X-Cache'] == 'MISS'
+    assert 'The Dueling Pianos Bar' in response.get_data(as_text=True)
+
+
+def test_lru_is_refused_with_several_workers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(RuntimeError, match='WEB_CONCURRENCY = 4'):
+        create_app(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite:///{}'.format(tmp_path / 'test.db'),
+                   CACHE_TYPE='lru', WEB_CONCURRENCY=4)
@@ -0,0 +1,49 @@
+import gzip
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from compress import CompressionMiddleware
+
+
+def test_pages_are_gzipped(client, seed):
+    seed(40, venues=20, artists=10)
+    plain = client.get('/venues', headers={"Accept-Encoding": 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    packed = client.get('/venues', headers={"Accept-Encoding": 'gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert packed.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(packed.get_data()) == plain.get_data()
+
+
+def test_not_modified_keeps_vary(client, create):
+    url = '/venues/{}'.format(create('venue', 'The Musical Hop'))
+    etag = client.get(url, headers={"Accept-Encoding": 'gzip'}).headers['ETag']
+    response = client.get(url, headers={"Accept-Encoding": 'gzip', "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_passed_through_body_is_closed():
+    closed = []
+
+    class Body(object):
+        def __iter__(self):
+            return iter([b' world'])
+
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        # an old-style app that writes part of its body through write()
+        write = start_response('200 OK', [('Content-Type', 'image/png')])
+        write(b'hello')
+        return Body()
+
+    response = Client(CompressionMiddleware(app), Response).get('/', headers={"Accept-Encoding": 'gzip'})
+    assert response.get_data() == b'hello world'
+    assert 'Content-Encoding' not in response.headers
+    response.close()
+    assert closed == [True]
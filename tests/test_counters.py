@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from models import db, Venue, Artist, Show, utcnow
+
+
+def counters(app, model, owner_id):
+    with app.app_context():
+        owner = db.session.get(model, owner_id)
+        return owner.upcoming_shows_count, owner.past_shows_count
+
+
+def add_show(client, venue_id, artist_id, start_time):
+    response = client.post('/shows/create', data={
+      "venue_id": venue_id, "artist_id": artist_id, "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S')})
+    assert response.status_code == 200
+
+
+def verify(app):
+    return app.test_cli_runner().invoke(args=['fyyur', 'verify-counters'])
+
+
+def test_counters_follow_show_writes(app, client, create):
+    venue_id = create('venue', 'The Musical Hop')
+    other_id = create('venue', 'Park Square Live Music & Coffee')
+    artist_id = create('artist', 'Guns N Petals')
+    add_show(client, venue_id, artist_id, utcnow() + timedelta(days=2))
+    add_show(client, other_id, artist_id, utcnow() + timedelta(days=4))
+    add_show(client, venue_id, artist_id, utcnow() - timedelta(days=2))
+    assert counters(app, Venue, venue_id) == (1, 1)
+    assert counters(app, Venue, other_id) == (1, 0)
+    assert counters(app, Artist, artist_id) == (2, 1)
+
+    # the venue's shows go with it, and off the artist's counters
+    assert client.post('/venues/{}/delete'.format(venue_id)).status_code == 200
+    with app.app_context():
+        assert db.session.get(Venue, venue_id) is None
+        assert Show.query.count() == 1
+    assert counters(app, Artist, artist_id) == (1, 0)
+    assert verify(app).exit_code == 0
+
+
+def test_roll_forward_and_verify(app, client, create):
+    venue_id = create('venue', 'The Musical Hop')
+    artist_id = create('artist', 'Guns N Petals')
+    add_show(client, venue_id, artist_id, utcnow() + timedelta(days=1))
+    # time passes: the show has started
+    with app.app_context():
+        db.session.execute(Show.__table__.update().values(start_time=utcnow() - timedelta(minutes=5)))
+        db.session.commit()
+    result = verify(app)
+    assert result.exit_code == 1
+    assert '2 counters drifted' in result.output
+
+    result = app.test_cli_runner().invoke(args=['fyyur', 'roll-forward'])
+    assert 'Rolled forward 1 shows' in result.output
+    assert counters(app, Venue, venue_id) == (0, 1)
+    assert counters(app, Artist, artist_id) == (0, 1)
+    assert verify(app).exit_code == 0
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+import pytest
+
+from extensions import jobs
+from models import db, Job, utcnow
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    # a 'record' task that appends its args, and a 'broken' one that raises
+    calls = []
+
+    def broken(**args):
+        raise RuntimeError('no luck')
+
+    monkeypatch.setitem(jobs.tasks, 'record', lambda **args: calls.append(args))
+    monkeypatch.setitem(jobs.tasks, 'broken', broken)
+    return calls
+
+
+def queued(app, task, **args):
+    with app.app_context():
+        job = jobs.enqueue(task, **args)
+        db.session.commit()
+        return job.id
+
+
+def naive(moment):
+    # SQLite hands DateTime(timezone=True) columns back without the zone
+    return moment.replace(tzinfo=None)
+
+
+def test_a_claimed_job_is_leased_to_one_worker(app, calls):
+    job_id = queued(app, 'record', n=1)
+    with app.app_context():
+        job = jobs.claim()
+        assert job.id == job_id and job.attempts == 1
+        assert naive(job.run_at) > naive(utcnow() + timedelta(seconds=app.config['JOBS_LEASE_SECONDS'] - 5))
+        assert jobs.claim() is None
+        assert jobs.run(job) == 'done'
+        assert Job.query.count() == 0
+    assert calls == [{"n": 1}]
+
+
+def test_an_expired_lease_is_claimed_again(app, calls):
+    job_id = queued(app, 'record', n=1)
+    with app.app_context():
+        assert jobs.claim().id == job_id
+        # the worker died; its lease runs out
+        Job.query.filter_by(id=job_id).update({"run_at": utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        job = jobs.claim()
+        assert job.id == job_id and job.attempts == 2
+
+
+def test_a_failing_job_backs_off_then_fails_for_good(app, calls):
+    app.config['JOBS_RETRY_BASE_SECONDS'] = 10
+    job_id = queued(app, 'broken', max_attempts=2)
+    with app.app_context():
+        assert jobs.run(jobs.claim()) == 'retry'
+        job = db.session.get(Job, job_id)
+        assert job.failed_at is None and 'no luck' in job.last_error
+        assert naive(utcnow() + timedelta(seconds=5)) < naive(job.run_at) <= naive(utcnow() + timedelta(seconds=10))
+        assert jobs.claim() is None
+
+        Job.query.filter_by(id=job_id).update({"run_at": utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        assert jobs.run(jobs.claim()) == 'failed'
+        job = db.session.get(Job, job_id)
+        assert job.failed_at is not None and job.attempts == 2
+        # dead-lettered: kept for inspection, never claimed again
+        Job.query.filter_by(id=job_id).update({"run_at": utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        assert jobs.claim() is None
+
+
+def test_a_rolled_back_write_drops_its_job(app, calls):
+    with app.app_context():
+        jobs.enqueue('record', n=1)
+        db.session.rollback()
+        assert Job.query.count() == 0
+
@@ -0,0 +1,53 @@
+import glob
+import json
+import os
+import re
+import subprocess
+
+from sqlalchemy.pool import QueuePool
+
+from main import create_app
+
+
+def gauge(text, name):
+    return float(re.search(r'^{} (\S+)$'.format(name), text, re.M).group(1))
+
+
+def test_pool_gauges(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = create_app(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite:///{}'.format(tmp_path / 'test.db'),
+                     SQLALCHEMY_ENGINE_OPTIONS={"poolclass": QueuePool, "pool_size": 5, "max_overflow": 2})
+    text = app.test_client().get('/metrics').get_data(as_text=True)
+    assert gauge(text, 'fyyur_db_pool_size') == 5
+    # an unfilled pool has no overflow, though QueuePool counts it as -5
+    assert gauge(text, 'fyyur_db_pool_overflow') == 0
+
+
+def exited_snapshot(directory, name, pid, started, requests):
+    # what a worker that has since exited left behind
+    snapshot = {"pid": pid, "started": started, "counters": {"fyyur_http_requests_total": {'': requests}},
+                "gauges": {"fyyur_http_requests_in_flight": {'': 3}}, "histograms": {}}
+    with open(os.path.join(directory, name), 'w') as file:
+        json.dump(snapshot, file)
+
+
+def test_exited_workers_counters_survive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    directory = str(tmp_path / 'metrics')
+    app = create_app(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite:///{}'.format(tmp_path / 'test.db'),
+                     METRICS_DIR=directory)
+    exited = subprocess.Popen(['true'])
+    exited.wait()
+    exited_snapshot(directory, '{}-a.json'.format(exited.pid), exited.pid, None, 7)
+    # a later process got this one's pid
+    exited_snapshot(directory, '{}-b.json'.format(os.getpid()), os.getpid(), -1, 5)
+
+    client = app.test_client()
+    for scrape in range(2):
+        text = client.get('/metrics').get_data(as_text=True)
+        assert gauge(text, 'fyyur_http_requests_total') == 12
+        assert gauge(text, 'fyyur_http_requests_in_flight') == 1
+    # both exited snapshots are gone, folded into the tombstone
+    assert sorted(glob.glob(os.path.join(directory, '*.json'))) == [
+      app.extensions['metrics'].worker(), os.path.join(directory, 'tombstone.json')
+    ]
@@ -0,0 +1,36 @@
+import os
+from datetime import datetime
+
+from flask_migrate import upgrade
+
+from conftest import basedir
+from main import create_app
+from models import db, Show
+
+migrations = os.path.join(basedir, 'migrations')
+
+
+def test_string_start_times_become_sqlalchemy_datetimes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = create_app(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite:///{}'.format(tmp_path / 'test.db'))
+    stored = ['2019-05-21T21:30:00.000Z', '2035-04-01 20:00:00', '2035-04-08T20:00:00-07:00',
+              '2035-04-15 20:00:00.250000']
+    with app.app_context():
+        # start times as the form stored them, before the column was a timestamp
+        upgrade(directory=migrations, revision='7c32a257bd8b')
+        db.session.execute(db.text('INSERT INTO "Venue" (id, name) VALUES (1, \'The Musical Hop\')'))
+        db.session.execute(db.text('INSERT INTO "Artist" (id, name) VALUES (1, \'Guns N Petals\')'))
+        for start_time in stored:
+            db.session.execute(db.text('INSERT INTO "Show" (start_time, artist_id, venue_id) VALUES (:start_time, 1, 1)'),
+                               {"start_time": start_time})
+        db.session.commit()
+        upgrade(directory=migrations)
+
+        raw = db.session.execute(db.text('SELECT start_time FROM "Show" ORDER BY id')).scalars().all()
+        assert raw == ['2019-05-21 21:30:00.000000', '2035-04-01 20:00:00.000000', '2035-04-09 03:00:00.000000',
+                       '2035-04-15 20:00:00.250000']
+        assert [show.start_time for show in Show.query.order_by(Show.id)][:2] == [
+          datetime(2019, 5, 21, 21, 30), datetime(2035, 4, 1, 20)
+        ]
+        db.session.remove()
+        db.get_engine().dispose()
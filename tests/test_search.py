@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+
+import search
+from models import db, Venue, Artist, Genre, Show, utcnow
+from queries import search_results
+
+
+@pytest.fixture
+def venues(app):
+    with app.app_context():
+        jazz = Genre(name='Jazz')
+        hop = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=[jazz])
+        park = Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA')
+        pianos = Venue(name='The Dueling Pianos Bar', city='New York', state='NY', genres=[jazz])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([hop, park, pianos, artist])
+        db.session.flush()
+        db.session.add(Show(venue_id=hop.id, artist_id=artist.id, start_time=utcnow() + timedelta(days=3)))
+        search.reindex(db.session, Venue)
+        search.reindex(db.session, Artist)
+        db.session.commit()
+        yield {venue.name: venue.id for venue in (hop, park, pianos)}
+
+
+def names(app, term):
+    with app.test_request_context():
+        return [result['name'] for result in search_results(Venue, term)['data']]
+
+
+def test_search_matches_name_city_and_genre(app, venues):
+    assert names(app, 'Hop') == ['The Musical Hop']
+    assert sorted(names(app, 'Music')) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+    assert sorted(names(app, 'new york')) == ['The Dueling Pianos Bar']
+    assert sorted(names(app, 'jazz')) == ['The Dueling Pianos Bar', 'The Musical Hop']
+    assert names(app, 'opera') == []
+    assert names(app, '"*) OR (') == []
+
+
+def test_search_reports_upcoming_shows(app, venues):
+    with app.test_request_context():
+        results = search_results(Venue, 'San Francisco')
+    assert results['count'] == 2
+    counts = {result['name']: result['num_upcoming_shows'] for result in results['data']}
+    assert counts == {"The Musical Hop": 1, "Park Square Live Music & Coffee": 0}
+
+
+def test_search_page(client, venues):
+    response = client.post('/venues/search', data={"search_term": 'hop'})
+    assert response.status_code == 200
+    assert 'The Musical Hop' in response.get_data(as_text=True)
+
+
+def test_autocomplete_matches_name_prefixes(client, venues):
+    response = client.get('/api/search', query_string={"type": 'venue', "q": 'the du'})
+    assert response.status_code == 200
+    assert [result['name'] for result in response.get_json()['results']] == ['The Dueling Pianos Bar']
+    # cities are not autocompleted
+    assert client.get('/api/search', query_string={"type": 'venue', "q": 'new'}).get_json()['results'] == []
+    assert client.get('/api/search', query_string={"type": 'band', "q": 'the'}).status_code == 400
+
+
+def indexed(app, table):
+    with app.app_context():
+        return db.session.execute(text('SELECT rowid, name FROM "{}"'.format(table))).all()
+
+
+def found(client, term):
+    return client.get('/api/search', query_string={"type": 'venue', "q": term}).get_json()['results']
+
+
+def test_index_follows_venue_writes(app, client, create):
+    venue_id = create('venue', 'The Musical Hop')
+    assert indexed(app, 'Venue_fts') == [(venue_id, 'The Musical Hop')]
+    assert [result['id'] for result in found(client, 'the mus')] == [venue_id]
+
+    form = {"name": 'The Dueling Pianos Bar', "city": 'New York', "state": 'NY', "phone": '914-003-1132',
+            "genres": ['Jazz'], "facebook_link": '', "image_link": '', "website_link": '', "seeking_description": ''}
+    client.post('/venues/{}/edit'.format(venue_id), data=form)
+    assert indexed(app, 'Venue_fts') == [(venue_id, 'The Dueling Pianos Bar')]
+    assert found(client, 'the mus') == []
+    assert [result['id'] for result in found(client, 'the due')] == [venue_id]
+
+    client.post('/venues/{}/delete'.format(venue_id))
+    assert indexed(app, 'Venue_fts') == []
+    assert found(client, 'the due') == []
+
+
+def test_index_follows_new_artists(app, create):
+    artist_id = create('artist', 'Guns N Petals')
+    assert indexed(app, 'Artist_fts') == [(artist_id, 'Guns N Petals')]
@@ -0,0 +1,41 @@
+import base64
+import json
+import re
+
+import pytest
+
+from queries import encode_cursor
+
+
+def cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+def test_shows_pages_follow_the_cursor(client, seed):
+    seed(25, venues=5, artists=5)
+    url, pages = '/shows?limit=10', 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages += 1
+        next_link = re.search(r'<li class="next"><a href="([^"]+)"', response.get_data(as_text=True))
+        url = next_link.group(1).replace('&amp;', '&') if next_link else None
+    assert pages == 3
+
+
+@pytest.mark.parametrize('after', [
+    'not base64!',
+    cursor([1, 2]),
+    cursor(['2022-01-01T00:00:00+00:00']),
+    cursor(['tomorrow-ish', 2]),
+    cursor(['2022-01-01T00:00:00+00:00', 'two']),
+    cursor(None),
+])
+def test_shows_refuses_a_bad_cursor(client, after):
+    assert client.get('/shows', query_string={"after": after}).status_code == 400
+
+
+def test_shows_accepts_a_cursor_it_made(client, seed):
+    seed(5, venues=1, artists=1)
+    after = encode_cursor('2022-01-01T00:00:00+00:00', 1)
+    assert client.get('/shows', query_string={"after": after}).status_code == 200
@@ -0,0 +1,61 @@
+import pytest
+from flask import Response, stream_with_context
+
+from models import Venue
+from sqltrace import NPlusOneError
+
+
+@pytest.fixture
+def names(app, create):
+    # /names looks its venues up one at a time: a deliberate N+1
+    ids = [create('venue', 'Venue {}'.format(number)) for number in range(8)]
+
+    def names():
+        return ', '.join(Venue.query.get(venue_id).name for venue_id in ids)
+    app.add_url_rule('/names', 'names', names)
+    return ids
+
+
+def test_n_plus_one_raises_under_testing(client, names):
+    with pytest.raises(NPlusOneError, match='N\\+1 in names: statement ran 8 times'):
+        client.get('/names')
+
+
+def test_n_plus_one_is_logged_when_not_raising(app, client, names, caplog):
+    app.config['SQLTRACE_RAISE'] = False
+    assert client.get('/names').status_code == 200
+    assert 'N+1 in names: statement ran 8 times' in caplog.text
+
+
+def test_server_timing_reports_statements(client, create):
+    create('venue', 'The Musical Hop')
+    timings = client.get('/venues/1').headers.getlist('Server-Timing')
+    assert len(timings) == 2
+    assert timings[0].startswith('db;dur=') and 'queries"' in timings[0] and '"0 queries"' not in timings[0]
+    assert timings[1].startswith('app;dur=')
+
+
+def test_streamed_body_is_checked_for_n_plus_one(app, client, names):
+    def streamed_names():
+        def generate():
+            for venue_id in names:
+                yield Venue.query.get(venue_id).name
+        return Response(stream_with_context(generate()))
+    app.add_url_rule('/names/streamed', 'streamed_names', streamed_names)
+
+    response = client.get('/names/streamed')
+    # the headers went out before the body's queries
+    assert 'desc="0 queries"' in response.headers['Server-Timing']
+    assert response.get_data(as_text=True).startswith('Venue 0')
+    with pytest.raises(NPlusOneError):
+        response.close()
+
+
+def test_streamed_venues_have_no_n_plus_one(app, client, create):
+    app.config['VENUES_STREAM_THRESHOLD'] = 2
+    for number in range(8):
+        create('venue', 'Venue {}'.format(number), city='City {}'.format(number))
+    response = client.get('/venues')
+    assert response.is_streamed
+    assert 'Venue 7' in response.get_data(as_text=True)
+    response.close()
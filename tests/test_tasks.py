@@ -0,0 +1,61 @@
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from tasks import PublicRedirectHandler, UnsafeLink, check_address
+
+
+@pytest.mark.parametrize('address', [
+    '127.0.0.1', '10.0.0.8', '172.16.4.2', '192.168.1.1', '169.254.169.254', '100.64.0.1', '0.0.0.0',
+    '224.0.0.1', '::1', 'fe80::1', 'fc00::1', '::ffff:127.0.0.1',
+])
+def test_private_addresses_are_refused(address):
+    with pytest.raises(UnsafeLink):
+        check_address(address)
+
+
+@pytest.mark.parametrize('address', ['93.184.216.34', '2606:2800:220:1:248:1893:25c8:1946'])
+def test_public_addresses_pass(address):
+    check_address(address)
+
+
+def test_redirects_stay_on_http():
+    request = urllib.request.Request('http://example.com/a.png', method='HEAD')
+    handler = PublicRedirectHandler()
+    assert handler.redirect_request(request, None, 302, 'Found', {}, 'https://example.org/a.png') is not None
+    with pytest.raises(UnsafeLink):
+        handler.redirect_request(request, None, 302, 'Found', {}, 'ftp://example.org/a.png')
+
+
+@pytest.fixture
+def local_server():
+    # an image server only reachable from this machine
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            hits.append(self.path)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_port), hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_image_check_does_not_fetch_local_links(app, create, local_server, caplog):
+    url, hits = local_server
+    create('venue', 'The Musical Hop', image_link=url + '/latest/meta-data/')
+    result = app.test_cli_runner().invoke(args=['fyyur', 'worker', '--burst', '--concurrency', '1'])
+    assert '1 jobs done' in result.output
+    assert hits == []
+    assert 'is not a public address' in caplog.text
@@ -0,0 +1,39 @@
+from datetime import datetime, timezone
+
+from extensions import cache
+from models import db, Venue, Artist, Show
+
+
+def add_venues(app, count, start=0):
+    # `count` venues, three to a city, each with one upcoming and one past show
+    with app.app_context():
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add(artist)
+        for number in range(start, start + count):
+            venue = Venue(name='Venue {}'.format(number), city='City {}'.format(number // 3), state='CA')
+            venue.shows = [Show(Artist=artist, start_time=datetime(2035, 1, 1, 20, tzinfo=timezone.utc)),
+                           Show(Artist=artist, start_time=datetime(2015, 1, 1, 20, tzinfo=timezone.utc))]
+            db.session.add(venue)
+        db.session.commit()
+
+
+def venues_statements(client, statements):
+    # statements run by an uncached GET /venues
+    cache.invalidate('venues')
+    before = statements()
+    response = client.get('/venues')
+    assert response.status_code == 200
+    return statements() - before, response.get_data(as_text=True)
+
+
+def test_venue_listing_statements_do_not_grow_with_venues(app, client, statements):
+    add_venues(app, 20)
+    # the first request also sets up the connection
+    venues_statements(client, statements)
+    few, page = venues_statements(client, statements)
+    assert 'Venue 19' in page
+
+    add_venues(app, 180, start=20)
+    many, page = venues_statements(client, statements)
+    assert 'Venue 199' in page
+    assert many == few
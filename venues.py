@@ -0,0 +1,183 @@
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+from itertools import chain, islice
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+
+from extensions import cache, replicas
+from cache import conditional
+from forms import VenueForm
+from streaming import Stream, stream_template
+from models import db, Venue, utcnow
+from tasks import queue_image_check
+from queries import genres_named, venue_rows, venue_areas, search_results, venue_cache_tags, venue_version, table_version, venue_detail
+
+bp = Blueprint('venues', __name__)
+
+
+@bp.route('/venues')
+@replicas.read_only
+@conditional(lambda: table_version(Venue))
+@cache.cached('venues')
+def venues():
+    # ?genre= lists only the venues tagged with that genre. Up to
+    # VENUES_STREAM_THRESHOLD venues the page is rendered whole (and cached);
+    # longer listings are streamed while the rows are still being fetched.
+    genre = request.args.get('genre') or None
+    rows = venue_rows(genre=genre)
+    threshold = current_app.config['VENUES_STREAM_THRESHOLD']
+    head = list(islice(rows, threshold))
+    if len(head) < threshold:
+        return render_template('pages/venues.html', areas=venue_areas(head), genre=genre)
+    stream = Stream(current_app.config['STREAM_BUFFER_BYTES'])
+    return stream_template('pages/venues.html', stream=stream, areas=stream.rows(venue_areas(chain(head, rows))),
+                           genre=genre)
+
+
+@bp.route('/venues/search', methods=['POST'])
+@replicas.read_only
+def search_venues():
+    # ranked search over venue name, city and genres.
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    search_term = request.form.get('search_term', '')
+    response = search_results(Venue, search_term)
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@bp.route('/venues/<int:venue_id>')
+@replicas.read_only
+@conditional(venue_version)
+@cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    return render_template('pages/show_venue.html', venue=venue_detail(venue_id))
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+
+    # on successful db insert, flash success
+
+    try:
+        add_venue = Venue(name=request.form['name'], city=request.form['city'],
+                          state=request.form['state'], address=request.form['address'],
+                          genres=genres_named(request.form.getlist('genres')),
+                          website_link=request.form['website_link'],
+                          phone=request.form['phone'], image_link=request.form['image_link'],
+                          facebook_link=request.form['facebook_link'])
+
+        db.session.add(add_venue)
+        db.session.flush()
+        queue_image_check(add_venue)
+        db.session.commit()
+        cache.invalidate('venues')
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    except:
+        print('in except')
+        db.session.rollback()
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+
+@bp.route('/venues/<int:venue_id>/delete', methods=['POST'])
+def delete_venue(venue_id):
+    # TODO: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+    venue = Venue.query.get_or_404(venue_id)
+    name = venue.name
+    cache_tags = venue_cache_tags(venue_id)
+    try:
+        # row by row through the session, so the after_flush listeners take
+        # the shows off their artists' counters and the venue out of search
+        for show in venue.shows:
+            db.session.delete(show)
+        db.session.delete(venue)
+        db.session.commit()
+        cache.invalidate(*cache_tags)
+        flash('Venue ' + name + ' was successfully deleted!')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Venue ' + name + ' could not be deleted.')
+    finally:
+        db.session.close()
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return render_template('pages/home.html')
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    form = VenueForm()
+    my_venue = Venue.query.get_or_404(venue_id)
+    # TODO: populate form with values from venue with ID <venue_id>
+    venue = {
+      "id": venue_id,
+      "name": my_venue.name,
+      "genres": [genre.name for genre in my_venue.genres],
+      "address": my_venue.address,
+      "city": my_venue.city,
+      "state": my_venue.state,
+      "phone": my_venue.phone,
+      "website_link": my_venue.website_link,
+      "facebook_link": my_venue.facebook_link,
+      "seeking_talent": my_venue.seeking_talent,
+      "seeking_description": my_venue.seeking_description,
+      "image_link": my_venue.image_link
+    }
+
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+
+    seeking_talent = request.form.get('seeking_venue')
+    is_seeking = False
+    if seeking_talent:
+        is_seeking = True
+    else:
+        pass
+    try:
+        venue = Venue.query.get(venue_id)
+        venue.name = request.form['name']
+        venue.city = request.form['city']
+        venue.state = request.form['state']
+        venue.phone = request.form['phone']
+        venue.genres = genres_named(request.form.getlist('genres'))
+        venue.facebook_link = request.form['facebook_link']
+        image_changed = venue.image_link != request.form['image_link']
+        venue.image_link = request.form['image_link']
+        venue.website_link = request.form['website_link']
+        venue.seeking_venue = is_seeking
+        venue.seeking_description = request.form['seeking_description']
+        venue.updated_at = utcnow()
+        if image_changed:
+            queue_image_check(venue)
+        db.session.commit()
+        cache.invalidate(*venue_cache_tags(venue_id))
+        flash('Venue ' + request.form['name'] + ' was successfully changed!')
+    except:
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be changed.')
+    finally:
+        db.session.close()
+    # venue record with ID <venue_id> using the new attributes
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))